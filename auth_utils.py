@@ -16,7 +16,16 @@ if SECRET_KEY == "varaha_secret_key_change_this_in_production":
         RuntimeWarning
     )
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# OWASP minimum argon2id profile (19 MiB, t=2, p=1). passlib's default uses
+# ~100 MiB and 8 lanes per verify, which lets a burst of logins exhaust the box.
+# Existing hashes keep verifying: the parameters are stored in each hash.
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
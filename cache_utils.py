@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process TTL + LRU cache.
+
+    get_or_load(key, loader) returns the cached value while it is fresh. On a
+    miss only one caller runs loader() per key; concurrent callers wait for it
+    (or, with stale_while_revalidate=True, get the previous value straight away).
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128, stale_while_revalidate: bool = False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_while_revalidate = stale_while_revalidate
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._loading = {}          # key -> Lock held while loader() runs
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                return entry[1]
+        return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def incr(self, key, delta=1):
+        """Atomically add delta to a counter and return the new value. The
+        entry keeps the expiry set when the counter was first created, so
+        the window is fixed rather than sliding."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                value = entry[1] + delta
+                self._data[key] = (entry[0], value)
+            else:
+                value = delta
+                self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                return entry[1]
+            stale = entry[1] if entry and self.stale_while_revalidate else _MISSING
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Someone else is already refreshing: serve the stale copy if allowed
+        if stale is not _MISSING and not key_lock.acquire(blocking=False):
+            return stale
+        if stale is _MISSING:
+            key_lock.acquire()
+        try:
+            # Another caller may have filled the entry while we waited
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = loader()
+                self.set(key, value)
+            return value
+        finally:
+            key_lock.release()
+            # Drop the per-key lock so _loading stays bounded; callers still
+            # waiting on it re-check the cache after they acquire it.
+            with self._lock:
+                if self._loading.get(key) is key_lock:
+                    del self._loading[key]
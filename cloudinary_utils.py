@@ -16,26 +16,31 @@ cloudinary.config(
   secure = True
 )
 
+# Videos/audio are sent with upload_large in chunks of this size, so only one
+# chunk of the (spooled) upload is in memory at a time
+UPLOAD_CHUNK_SIZE = 6_000_000
+
 def upload_video_to_cloudinary(file_content, public_id=None):
     """
     Uploads a video to Cloudinary.
+    file_content may be bytes or a file-like object (e.g. UploadFile.file).
     Returns the secure URL of the uploaded video.
     """
     try:
-        print(f"Uploading video to Cloudinary (size: {len(file_content)} bytes)...")
+        print("Uploading video to Cloudinary (chunked)...")
         
         # Upload options
         options = {
             "resource_type": "video",
             "folder": "heritage_videos",
+            "chunk_size": UPLOAD_CHUNK_SIZE,
         }
         
         if public_id:
             options["public_id"] = public_id
 
-        # Cloudinary accepts file-like objects or paths. 
-        # Since we have bytes, we can pass it directly.
-        response = cloudinary.uploader.upload(file_content, **options)
+        # upload_large streams file-like objects chunk by chunk
+        response = cloudinary.uploader.upload_large(_as_file(file_content), **options)
         
         print(f"Cloudinary upload success: {response.get('secure_url')}")
         return response.get('secure_url')
@@ -48,14 +53,19 @@ def upload_video_to_cloudinary(file_content, public_id=None):
 from io import BytesIO
 from PIL import Image
 
+def _as_file(file_content):
+    """Wrap raw bytes in BytesIO; file-like objects are passed through untouched."""
+    return file_content if hasattr(file_content, "read") else BytesIO(file_content)
+
 def upload_image_to_cloudinary(file_content, folder="returns"):
     """
     Uploads an image to Cloudinary after compressing to WebP.
+    file_content may be bytes or a file-like object (e.g. UploadFile.file).
     Returns the secure URL of the uploaded image.
     """
     try:
-        # Compress to WebP first
-        img = Image.open(BytesIO(file_content))
+        # Compress to WebP first (PIL reads straight from the file object)
+        img = Image.open(_as_file(file_content))
         
         # Convert mode if needed
         if img.mode in ('RGBA', 'LA', 'P'):
@@ -81,7 +91,6 @@ def upload_image_to_cloudinary(file_content, folder="returns"):
         
         compressed_content = output.getvalue()
         
-        print(f"Image compressed: {len(file_content)} bytes -> {len(compressed_content)} bytes (WebP)")
         print(f"Uploading WebP image to Cloudinary (size: {len(compressed_content)} bytes)...")
         
         # Upload options with WebP format
@@ -109,18 +118,20 @@ def upload_image_to_cloudinary(file_content, folder="returns"):
 def upload_audio_to_cloudinary(file_content, folder="ciplx_music"):
     """
     Uploads audio to Cloudinary.
+    file_content may be bytes or a file-like object (e.g. UploadFile.file).
     Returns the secure URL of the uploaded audio.
     """
     try:
-        print(f"Uploading audio to Cloudinary (size: {len(file_content)} bytes)...")
+        print("Uploading audio to Cloudinary (chunked)...")
         
         # Upload options
         options = {
             "resource_type": "video",  # Cloudinary uses "video" type for audio
             "folder": folder,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
         }
         
-        response = cloudinary.uploader.upload(file_content, **options)
+        response = cloudinary.uploader.upload_large(_as_file(file_content), **options)
         
         print(f"Cloudinary audio upload success: {response.get('secure_url')}")
         return response.get('secure_url')
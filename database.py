@@ -58,13 +58,25 @@ else:
         pool_pre_ping=True, 
         pool_recycle=280, # Recycle before Supabase's 5-minute idle timeout
         pool_timeout=30,  # Prevent indefinite blocking
-        pool_size=10, 
-        max_overflow=20
+        query_cache_size=1200,  # Compiled-SQL cache (default 500) so hot statements stay compiled
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")), 
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20"))
     )
 
+# Read-only view of the same pool: AUTOCOMMIT skips the BEGIN/ROLLBACK round
+# trips SQLAlchemy wraps around every checkout. Only use it for plain SELECTs.
+read_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
-    with Session(engine) as session:
+    # Keep attribute values after commit: nothing in the models is filled in by
+    # the server except the primary key (populated by the INSERT itself), so the
+    # reload SELECT that expire-on-commit forces is never needed.
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+def get_read_session():
+    with Session(read_engine) as session:
         yield session
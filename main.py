@@ -5,6 +5,7 @@ load_dotenv(dotenv_path=env_path)
 
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from database import create_db_and_tables
 
 from middleware import MonitoringMiddleware
@@ -31,7 +32,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url=None,    
     redoc_url=None,   
-    openapi_url=None  
+    openapi_url=None,
+    default_response_class=ORJSONResponse  # orjson encodes responses several times faster than stdlib json
 )
 
 origins = [
@@ -82,6 +84,18 @@ def on_startup():
     except Exception as e:
         logger.error(f"Master Migration Failed: {e}")
 
+@app.on_event("startup")
+async def start_background_tasks():
+    # Batched visitor-log writer (see routes/analytics.py)
+    analytics.start_visit_flusher()
+    # Batched return-request Telegram alerts (see routes/customer.py)
+    customer.start_return_alert_sender()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await analytics.stop_visit_flusher()
+    await customer.stop_return_alert_sender()
+
 # Include Routers
 # Web Router handles "/" and docs login
 app.include_router(web.router, tags=["Web"]) 
@@ -164,7 +164,7 @@ TABLE_COLUMNS = {
         ("ip_hash", "VARCHAR", "NOT NULL DEFAULT ''"),
         ("path", "VARCHAR", "NOT NULL DEFAULT ''"),
         ("timestamp", "TIMESTAMP", "DEFAULT NOW()"),
-        ("date", "VARCHAR", "NOT NULL DEFAULT ''"),
+        ("date", "DATE", "NOT NULL DEFAULT CURRENT_DATE"),
         ("city", "VARCHAR", ""),
         ("state", "VARCHAR", ""),
         ("country", "VARCHAR", ""),
@@ -353,6 +353,51 @@ TABLE_COLUMNS = {
 }
 
 
+# ============================================================
+# Secondary indexes for hot query paths
+# Format: ("index_name", "table_name", "index expression")
+# Created with IF NOT EXISTS so re-runs are no-ops
+# ============================================================
+
+TABLE_INDEXES = [
+    # Latest-order lookups, admin/report listings ORDER BY created_at DESC
+    ("idx_order_created_at", "order", "(created_at DESC)"),
+    # /api/analytics: daily GROUP BY date + COUNT(DISTINCT ip_hash) for today
+    ("idx_visitorlog_date_ip", "visitorlog", "(date DESC, ip_hash)"),
+    # /api/analytics/logs: ORDER BY timestamp DESC LIMIT n
+    ("idx_visitorlog_ts", "visitorlog", "(timestamp DESC)"),
+    # Admin returns list: optional status filter + ORDER BY created_at DESC
+    ("idx_orderreturn_status_created", "orderreturn", "(status, created_at DESC)"),
+    # validate_coupon: WHERE upper(code) = :code
+    ("ix_coupon_code_upper", "coupon", "(upper(code))"),
+    # add_to_cart duplicate check: WHERE cart_id = ? AND product_id = ? AND variant_sku = ?
+    ("ix_cartitem_cart_product_sku", "cartitem", "(cart_id, product_id, variant_sku)"),
+    # /api/categories: ORDER BY sort_order, name read straight off the index
+    ("ix_categories_sort", "category", "(sort_order, name)"),
+    # /api/categories?gender=: WHERE gender = ? AND is_active
+    ("ix_categories_gender_active", "category", "(gender, is_active)"),
+    # Address defaults: WHERE customer_id = ? AND is_default (bulk unset on add/update)
+    ("ix_addr_cust_default", "address", "(customer_id, is_default)"),
+]
+
+# Unique indexes: ("index_name", "table_name", (columns...)).
+# Duplicate rows (all but the lowest id per key) are deleted first so the index
+# can be built; only list tables where duplicates carry no extra data.
+TABLE_UNIQUE_INDEXES = [
+    # One wishlist row per (customer, product); membership checks + ON CONFLICT in sync
+    ("ix_wishlist_cust_prod", "wishlist", ("customer_id", "product_id")),
+]
+
+
+# Columns whose type changed after they were first created:
+# (table, column, target type as reported by the inspector, new SQL type, USING expr, new DEFAULT or None)
+# The old default is dropped first: Postgres refuses the change if it can't cast it.
+TABLE_TYPE_CHANGES = [
+    # visitorlog.date was a 'YYYY-MM-DD' VARCHAR; '' rows fall back to the timestamp's day
+    ("visitorlog", "date", "DATE", "DATE", "COALESCE(NULLIF(date, '')::date, timestamp::date, CURRENT_DATE)", "CURRENT_DATE"),
+]
+
+
 def get_existing_tables(conn):
     """Get all existing table names from the database."""
     inspector = inspect(conn)
@@ -438,12 +483,73 @@ def migrate():
                         error_count += 1
         
         conn.commit()
+
+    # Step 3: Convert column types
+    print("\n🔁 Step 3: Converting column types...")
+    converted_count = 0
+
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        for table_name, col_name, target_type, sql_type, using_expr, default_expr in TABLE_TYPE_CHANGES:
+            try:
+                current = {c["name"]: str(c["type"]) for c in inspector.get_columns(table_name)}
+            except Exception:
+                continue
+            if col_name not in current or current[col_name].upper() == target_type:
+                continue
+            alter = f'ALTER TABLE "{table_name}" ALTER COLUMN "{col_name}"'
+            try:
+                conn.execute(text(f"{alter} DROP DEFAULT"))
+                conn.execute(text(f"{alter} TYPE {sql_type} USING {using_expr}"))
+                if default_expr:
+                    conn.execute(text(f"{alter} SET DEFAULT {default_expr}"))
+                conn.commit()
+                print(f"   ✅ {table_name}.{col_name}: {current[col_name]} → {sql_type}")
+                converted_count += 1
+            except Exception as e:
+                conn.rollback()
+                print(f"   ❌ {table_name}.{col_name}: {e}")
+                error_count += 1
+
+    # Step 4: Ensure secondary indexes
+    print("\n🗂️  Step 4: Ensuring indexes...")
+    index_count = 0
+
+    with engine.connect() as conn:
+        for index_name, table_name, index_expr in TABLE_INDEXES:
+            sql = f'CREATE INDEX IF NOT EXISTS {index_name} ON "{table_name}" {index_expr}'
+            try:
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"   ✅ {index_name} on {table_name} {index_expr}")
+                index_count += 1
+            except Exception as e:
+                conn.rollback()
+                print(f"   ❌ {index_name}: {e}")
+                error_count += 1
+
+        for index_name, table_name, columns in TABLE_UNIQUE_INDEXES:
+            same_key = " AND ".join(f"a.{col} = b.{col}" for col in columns)
+            dedupe_sql = f'DELETE FROM "{table_name}" a USING "{table_name}" b WHERE a.id > b.id AND {same_key}'
+            sql = f'CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON "{table_name}" ({", ".join(columns)})'
+            try:
+                removed = conn.execute(text(dedupe_sql)).rowcount
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"   ✅ {index_name} (unique) on {table_name} ({', '.join(columns)}); {removed} duplicate(s) removed")
+                index_count += 1
+            except Exception as e:
+                conn.rollback()
+                print(f"   ❌ {index_name}: {e}")
+                error_count += 1
     
     # Summary
     print("\n" + "=" * 60)
     print(f"📊 Migration Summary:")
     print(f"   ✅ Columns added:   {added_count}")
     print(f"   ⏭️  Columns skipped: {skipped_count} (already exist)")
+    print(f"   🔁 Types converted: {converted_count}")
+    print(f"   🗂️  Indexes ensured: {index_count}")
     if error_count:
         print(f"   ❌ Errors:          {error_count}")
     print("=" * 60)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Optional, List
 from sqlmodel import Field, SQLModel
-from datetime import datetime
+from datetime import datetime, date as date_type
 import json
 
 class CategoryBase(SQLModel):
@@ -151,7 +151,7 @@ class VisitorLog(SQLModel, table=True):
     ip_hash: str = Field(index=True)
     path: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    date: str = Field(index=True) # YYYY-MM-DD for easy grouping
+    date: date_type = Field(index=True) # Native DATE (UTC day) for grouping/range scans
     city: Optional[str] = None
     state: Optional[str] = None
     country: Optional[str] = None
@@ -1,11 +1,32 @@
 import smtplib
+import asyncio
+import time
+import threading
 import requests
 import os
-import resend
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import sys
+from email.message import EmailMessage
 import json
 import logging
+import email.policy
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+
+# resend is only needed for the Resend provider
+try:
+    import resend
+except ImportError:
+    resend = None
+
+# boto3 is only needed for the SES provider
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+    ClientError = Exception
 
 # Configure logging
 # Configure logging
@@ -15,133 +36,106 @@ logger = logging.getLogger(__name__)
 from database import engine
 from sqlmodel import Session, select
 from models import Order
-
-def send_order_notifications(order_data):
-    """
-    Triggers email and Telegram notifications when a new order is received.
-    
-    Args:
-        order_data (dict): Contains 'order_id' and 'total_amount' (and optionally 'items' or 'items_json').
-    """
-    logger.info(f"🔔 BACKGROUND TASK TRIGGERED for Order: {order_data.get('order_id')}")
-    
-    # ── AUTO-PARSE items from items_json if items list is missing ──
-    # Order.dict() only gives items_json (string), not items (list)
-    if not order_data.get('items') and order_data.get('items_json'):
-        try:
-            parsed_items = json.loads(order_data['items_json'])
-            if isinstance(parsed_items, list):
-                order_data['items'] = parsed_items
-                logger.info(f"✅ Parsed {len(parsed_items)} items from items_json")
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.error(f"❌ Failed to parse items_json: {e}")
-            order_data['items'] = []
-    
-    logger.info(f"Preparing to send notifications for Order: {order_data.get('order_id')}")
-    
-    # --- 1. Email Notification ---
-    try:
-        # Robust sender email fallback: EMAIL_USER → EMAIL_SENDER → EMAIL_FROM
-        sender_email = os.getenv("EMAIL_USER") or os.getenv("EMAIL_SENDER") or os.getenv("EMAIL_FROM")
-        sender_password = os.getenv("EMAIL_PASSWORD") 
-        # Support for alias: authenticate with sender_email, but send as sender_alias if set
-        sender_alias = os.getenv("EMAIL_FROM") or os.getenv("EMAIL_SENDER") or sender_email
-        
-        logger.info(f"📧 Email Config: provider={os.getenv('EMAIL_PROVIDER')}, sender={sender_email}, alias={sender_alias}")
-        
-        # Admin Email
-        admin_email = os.getenv("ADMIN_EMAIL")
-        # Fallback to sender_email if ADMIN_EMAIL is not set or is the default example
-        if not admin_email or admin_email == "admin@example.com":
-            admin_email = sender_email
-
-        # AWS SES Credentials
-        aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "ap-south-1")
-        
-        # Determine Provider: 'ses' or 'smtp'
-        # Default to SES if keys are present, unless explicitly set to 'smtp'
-        email_provider = os.getenv("EMAIL_PROVIDER", "ses" if aws_access_key and aws_secret_key else "smtp").lower()
-        
-        # Prepare Email Content (Common for both)
-        # Extract product names for subject line
-        items_for_subject = order_data.get('items', [])
-        if not items_for_subject and 'items_json' in order_data:
-            try:
-                items_for_subject = json.loads(order_data['items_json'])
-            except:
-                items_for_subject = []
-        product_names = ', '.join([item.get('productName', item.get('name', '')) for item in items_for_subject if item.get('productName') or item.get('name')]) or 'Your Varaha Order'
-        # Truncate if too long
-        if len(product_names) > 60:
-            product_names = product_names[:57] + '...'
-        
-        subject_admin = f"New Order Received: {product_names}"
-        body_admin = f"""
+from routes.tracking import generate_tracking_token
+
+# Order-email sender identity is fixed for the process, so the From header is built once
+# Robust sender email fallback: EMAIL_USER → EMAIL_SENDER → EMAIL_FROM
+ORDER_SENDER_EMAIL = os.getenv("EMAIL_USER") or os.getenv("EMAIL_SENDER") or os.getenv("EMAIL_FROM")
+# Support for alias: authenticate with sender_email, but send as sender_alias if set
+ORDER_SENDER_ALIAS = os.getenv("EMAIL_FROM") or os.getenv("EMAIL_SENDER") or ORDER_SENDER_EMAIL
+ORDER_FROM_HEADER = f"Varaha Jewels <{ORDER_SENDER_ALIAS}>"
+
+# AWS SES Credentials
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION", "ap-south-1")
+
+# Determine Provider once per process: 'resend', 'ses' or 'smtp'
+# Default to SES if keys are present, unless explicitly set to 'smtp'; SES without keys falls back to SMTP
+_configured_provider = os.getenv("EMAIL_PROVIDER", "ses" if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY else "smtp").lower()
+if _configured_provider == "resend" or (_configured_provider == "ses" and AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY):
+    ORDER_EMAIL_PROVIDER = sys.intern(_configured_provider)
+else:
+    ORDER_EMAIL_PROVIDER = sys.intern("smtp")
+
+# Shipping / tracking emails (Resend only) — config is fixed for the process
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://varahajewels.in")
+RESEND_API_KEY = os.getenv("RESEND_API_KEY")
+SHIPPING_SENDER_ALIAS = os.getenv("EMAIL_FROM", os.getenv("EMAIL_USER") or os.getenv("EMAIL_SENDER"))
+SHIPPING_EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "smtp").lower()
+TRACKING_SENDER_ALIAS = os.getenv("EMAIL_FROM", os.getenv("EMAIL_USER"))
+TRACKING_EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "resend").lower()
+
+# Telegram config and message layout are fixed for the process
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_SEND_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage" if TELEGRAM_BOT_TOKEN else None
+ORDER_TELEGRAM_TEMPLATE = (
+    "🛍️ *NEW ORDER RECEIVED!*\n"
+    "━━━━━━━━━━━━━━━━━━\n\n"
+    "🆔 *Order ID:* `{order_id}`\n\n"
+    "👤 *Customer:* {customer_name}\n"
+    "📞 *Phone:* {phone}\n"
+    "📧 *Email:* {email}\n\n"
+    "📦 *Items:*\n{items_text}\n"
+    "{discount_text}"
+    "💰 *Total Amount:* ₹{total_amount}\n"
+    "{pay_emoji} *Payment:* {pay_label}\n\n"
+    "📍 *Delivery Address:*\n{full_address}\n\n"
+    "━━━━━━━━━━━━━━━━━━"
+)
+
+# Customer-facing Resend sends (shipping / tracking) run off the request path.
+# The semaphore bounds queued sends so a burst of webhooks applies backpressure.
+MAIL_QUEUE_MAX = 100
+_MAIL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="notif-mail")
+_mail_slots = threading.BoundedSemaphore(MAIL_QUEUE_MAX)
+
+# Email templates are compiled once at import and rendered per call.
+# The bytecode cache lets other worker processes skip the compile step too.
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+_JINJA_ENV = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html"]),
+    bytecode_cache=FileSystemBytecodeCache()
+)
+_SHIPPING_TMPL = _JINJA_ENV.get_template("email/shipping.html")
+_TRACKING_TMPLS = {
+    status: _JINJA_ENV.get_template(f"email/tracking_{status}.html")
+    for status in ("shipped", "out_for_delivery", "delivered")
+}
+
+# Order-confirmation HTML: plain module constants filled with str.format_map per order
+# (CSS braces are doubled so format_map leaves them alone)
+ORDER_ADMIN_HTML = """
         <html>
         <body>
             <h2>New Order Notification</h2>
-            <p><strong>Order ID:</strong> {order_data.get('order_id')}</p>
-            <p><strong>Total Amount:</strong> ₹{order_data.get('total_amount', 0)}</p>
-            <p><strong>Customer:</strong> {order_data.get('email', 'N/A')}</p>
+            <p><strong>Order ID:</strong> {order_id}</p>
+            <p><strong>Total Amount:</strong> ₹{total_amount}</p>
+            <p><strong>Customer:</strong> {customer_email}</p>
             <p>Please check the admin panel for more details.</p>
         </body>
         </html>
-        """
-        
-        msg_admin = MIMEMultipart()
-        msg_admin['From'] = f"Varaha Jewels <{sender_alias}>"
-        msg_admin['To'] = admin_email
-        msg_admin['Subject'] = subject_admin
-        msg_admin.attach(MIMEText(body_admin, 'html'))
+"""
 
-        # Customer Email Content
-        customer_email = order_data.get('email')
-        msg_customer = None
-        
-        if customer_email:
-            subject_customer = f"Order Confirmation - {product_names} | Varaha Jewels"
-            
-            # Generate tracking token for public tracking link
-            import hashlib
-            tracking_secret = os.getenv("TRACKING_SECRET", "varaha_track_secret_2026")
-            tracking_token = hashlib.sha256(f"{order_data.get('order_id')}_{tracking_secret}".encode()).hexdigest()[:16]
-            tracking_url = f"{os.getenv('FRONTEND_URL', 'https://varahajewels.in')}/track/{order_data.get('order_id')}_{tracking_token}"
-            # Prepare items HTML
-            items_html = ""
-            items = order_data.get('items', [])
-            # If items not found, try to parse items_json
-            if not items and 'items_json' in order_data:
-                try:
-                    items = json.loads(order_data['items_json'])
-                except json.JSONDecodeError:
-                    logger.error("Failed to parse items_json")
-                    items = []
-            if items:
-                items_html += '<table style="width: 100%; border-collapse: collapse;">'
-                for item in items:
-                    name = item.get('productName', item.get('name', 'Product'))
-                    qty = item.get('quantity', 1)
-                    price = item.get('price', 0)
-                    items_html += f"""
+ORDER_ITEM_ROW_HTML = """
                         <tr>
-                            <td style="padding: 10px 0; border-bottom: 1px dashed #e0d8c3; color: #1a1a1a; font-family: 'Georgia', serif; font-size: 16px;">{name}{f' x{qty}' if qty > 1 else ''}</td>
+                            <td style="padding: 10px 0; border-bottom: 1px dashed #e0d8c3; color: #1a1a1a; font-family: 'Georgia', serif; font-size: 16px;">{name}{qty_suffix}</td>
                             <td style="padding: 10px 0; border-bottom: 1px dashed #e0d8c3; text-align: right; color: #444; font-family: 'Helvetica', sans-serif; font-size: 15px;">₹{price}</td>
                         </tr>
-                    """
-                items_html += '</table>'
-            else:
-                items_html = f"""
+"""
+
+ORDER_NO_ITEMS_HTML = """
                     <table style="width: 100%; border-collapse: collapse;">
                         <tr>
                              <td style="padding: 10px 0; color: #1a1a1a; font-family: 'Georgia', serif; font-size: 16px;">Order Items</td>
-                             <td style="padding: 10px 0; text-align: right; color: #444; font-family: 'Helvetica', sans-serif; font-size: 15px;">₹{order_data.get('total_amount', 0)}</td>
+                             <td style="padding: 10px 0; text-align: right; color: #444; font-family: 'Helvetica', sans-serif; font-size: 15px;">₹{total_amount}</td>
                         </tr>
                     </table>
-                """
+"""
 
-            body_customer = f"""
+ORDER_CUSTOMER_HTML = """
             <!DOCTYPE html>
             <html lang="en">
             <head>
@@ -233,13 +227,13 @@ def send_order_notifications(order_data):
                                                 <td class="content-section">
                                                     <h1 class="welcome-text">Your Treasure Awaits</h1>
                                                     <p class="body-text">
-                                                        Namaste <strong>{order_data.get('customer_name', 'Customer')}</strong>,<br>
+                                                        Namaste <strong>{customer_name}</strong>,<br>
                                                         We are delighted to confirm your recent acquisition. Your timeless pieces are being prepared with the utmost care and will soon be on their way to you.
                                                     </p>
 
                                                     <!-- Order Summary Box -->
                                                     <div class="order-box">
-                                                        <div class="order-header">Order #{order_data.get('order_id')}</div>
+                                                        <div class="order-header">Order #{order_id}</div>
                                                         
                                                         <!-- Items -->
                                                         {items_html}
@@ -249,7 +243,7 @@ def send_order_notifications(order_data):
                                                             <table style="width: 100%; border-collapse: collapse;">
                                                                 <tr>
                                                                     <td class="total-label" style="padding-bottom: 8px;">Subtotal</td>
-                                                                    <td class="total-value" style="text-align: right; padding-bottom: 8px;">₹{order_data.get('total_amount', 0)}</td>
+                                                                    <td class="total-value" style="text-align: right; padding-bottom: 8px;">₹{total_amount}</td>
                                                                 </tr>
                                                                 <tr>
                                                                     <td class="total-label" style="padding-bottom: 8px;">Insured Shipping</td>
@@ -257,7 +251,7 @@ def send_order_notifications(order_data):
                                                                 </tr>
                                                                 <tr>
                                                                     <td class="total-label" style="padding-top: 15px; border-top: 1px solid #c5a059; color: #1a1a1a; font-weight: bold; font-family: 'Georgia', serif; font-size: 16px;">Grand Total</td>
-                                                                    <td class="total-value" style="text-align: right; padding-top: 15px; border-top: 1px solid #c5a059; color: #c5a059; font-weight: bold; font-size: 18px;">₹{order_data.get('total_amount', 0)}</td>
+                                                                    <td class="total-value" style="text-align: right; padding-top: 15px; border-top: 1px solid #c5a059; color: #c5a059; font-weight: bold; font-size: 18px;">₹{total_amount}</td>
                                                                 </tr>
                                                             </table>
                                                         </div>
@@ -266,7 +260,7 @@ def send_order_notifications(order_data):
                                                     <!-- CTA Button -->
                                                     <div class="btn-container">
                                                         <a href="{tracking_url}" class="btn" style="margin-right: 10px;">Track Order</a>
-                                                        <a href="{os.getenv('FRONTEND_URL', 'https://varahajewels.com')}/orders/{order_data.get('order_id')}" class="btn" style="background-color: transparent; color: #1a1a1a;">View Order Details</a>
+                                                        <a href="{order_url}" class="btn" style="background-color: transparent; color: #1a1a1a;">View Order Details</a>
                                                     </div>
                                                     
                                                     <p style="text-align: center; font-size: 14px; color: #777; margin-top: 30px; font-family: 'Helvetica', sans-serif;">
@@ -280,8 +274,8 @@ def send_order_notifications(order_data):
                                                     <!-- Shipping Address -->
                                                     <div style="text-align: center; font-size: 14px; color: #444; line-height: 1.6;">
                                                         <strong style="text-transform: uppercase; letter-spacing: 1px; font-size: 12px; color: #c5a059;">Shipping Destination</strong><br>
-                                                        {order_data.get('address')}<br>
-                                                        {order_data.get('city')}, {order_data.get('pincode')}
+                                                        {address}<br>
+                                                        {city}, {pincode}
                                                     </div>
                                                 </td>
                                             </tr>
@@ -304,132 +298,350 @@ def send_order_notifications(order_data):
                 </div>
             </body>
             </html>
-            """
-            
-            msg_customer = MIMEMultipart()
-            msg_customer['From'] = f"Varaha Jewels <{sender_alias}>"
-            msg_customer['To'] = customer_email
-            msg_customer['Subject'] = subject_customer
-            msg_customer.attach(MIMEText(body_customer, 'html'))
+"""
+
+# SES pass-through template: subject and HTML are rendered here and handed over as
+# template data, so admin + customer can share one SendBulkTemplatedEmail call.
+SES_TEMPLATE_NAME = "varaha_order_notification"
+_ses_template_ready = False
+
+def _ensure_ses_template(ses_client):
+    """
+    Create the SES pass-through template once per process (no-op if it already exists).
+    """
+    global _ses_template_ready
+    if _ses_template_ready:
+        return
+
+    try:
+        ses_client.create_template(Template={
+            'TemplateName': SES_TEMPLATE_NAME,
+            'SubjectPart': '{{subject}}',
+            'HtmlPart': '{{{html}}}'
+        })
+        logger.info("SES: Created template '%s'", SES_TEMPLATE_NAME)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'AlreadyExists':
+            raise
+    _ses_template_ready = True
+
+def _send_resend_email(params, label):
+    try:
+        result = resend.Emails.send(params)
+        logger.info("%s sent to %s. ID: %s", label, params["to"], result.id)
+    except Exception as e:
+        logger.error("Failed to send %s: %s", label, e)
+    finally:
+        _mail_slots.release()
+
+
+def _submit_resend_email(params, label):
+    """
+    Queue a Resend email on the mail pool; blocks only when MAIL_QUEUE_MAX sends are pending.
+    """
+    _mail_slots.acquire()
+    try:
+        _MAIL_POOL.submit(_send_resend_email, params, label)
+    except Exception:
+        _mail_slots.release()
+        raise
+
+
+def _set_email_status(order_id, email_status):
+    """
+    Record the outcome of the order-confirmation email on the Order row.
+    """
+    with Session(engine) as session:
+        statement = select(Order).where(Order.order_id == order_id)
+        order_record = session.exec(statement).first()
+        if order_record:
+            order_record.email_status = email_status
+            session.add(order_record)
+            session.commit()
+            logger.info("Updated Order %s email_status to '%s'", order_record.order_id, email_status)
+
+
+# Dedupe guard: repeated background-task / webhook deliveries for the same order
+# are dropped for an hour. Bounded LRU so memory stays flat.
+NOTIFIED_ORDERS_MAX = 10000
+NOTIFIED_ORDERS_TTL = 3600 # seconds
+_notified_orders = OrderedDict() # order_id -> claimed_at
+_notified_lock = threading.Lock()
+
+def _claim_order_notification(order_id):
+    """
+    Return True if this process should notify for order_id, False if it already did recently.
+    """
+    if not order_id:
+        return True
+
+    now = time.monotonic()
+    with _notified_lock:
+        # Entries are in claim order, so expired ones sit at the front
+        while _notified_orders:
+            if now - next(iter(_notified_orders.values())) < NOTIFIED_ORDERS_TTL:
+                break
+            _notified_orders.popitem(last=False)
+
+        if order_id in _notified_orders:
+            return False
+
+        _notified_orders[order_id] = now
+        if len(_notified_orders) > NOTIFIED_ORDERS_MAX:
+            _notified_orders.popitem(last=False)
+        return True
+
+
+def _release_order_notification(order_id):
+    """
+    Forget a claimed order so a later retry can send again (used when the email fails).
+    """
+    with _notified_lock:
+        _notified_orders.pop(order_id, None)
+
+
+def _prepare_order_data(order_data):
+    """
+    Normalise the order payload before notifications are built.
+    Order.dict() only gives items_json (string), so parse it into 'items'.
+    """
+    logger.debug("🔔 BACKGROUND TASK TRIGGERED for Order: %s", order_data.get('order_id'))
+    
+    # ── AUTO-PARSE items from items_json if items list is missing ──
+    if not order_data.get('items') and order_data.get('items_json'):
+        try:
+            parsed_items = json.loads(order_data['items_json'])
+            if isinstance(parsed_items, list):
+                order_data['items'] = parsed_items
+                logger.info("✅ Parsed %s items from items_json", len(parsed_items))
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.error("❌ Failed to parse items_json: %s", e)
+            order_data['items'] = []
+    
+    logger.info("Preparing to send notifications for Order: %s", order_data.get('order_id'))
+
+
+def _send_order_email(order_data):
+    """
+    Send the admin + customer order emails via the configured provider (Resend, SES or SMTP).
+    """
+    try:
+        sender_email = ORDER_SENDER_EMAIL
+        sender_password = os.getenv("EMAIL_PASSWORD") 
+        sender_alias = ORDER_SENDER_ALIAS
         
+        email_provider = ORDER_EMAIL_PROVIDER
+        use_smtp = email_provider == "smtp"
 
-        # --- SEND VIA RESEND ---
-        if email_provider == 'resend':
-            resend.api_key = os.getenv("RESEND_API_KEY")
-            logger.info("Sending emails via Resend...")
+        logger.info("📧 Email Config: provider=%s, sender=%s, alias=%s", email_provider, sender_email, sender_alias)
+        
+        # Admin Email
+        admin_email = os.getenv("ADMIN_EMAIL")
+        # Fallback to sender_email if ADMIN_EMAIL is not set or is the default example
+        if not admin_email or admin_email == "admin@example.com":
+            admin_email = sender_email
 
-            # Send to Admin
+        # Bail out before rendering any templates if nothing will be sent
+        if use_smtp and (not sender_email or not sender_password):
+            logger.warning("Email credentials not set. Skipping email notification.")
+            return
+        
+        # Prepare Email Content (Common for both)
+        # Extract product names for subject line
+        items_for_subject = order_data.get('items', [])
+        if not items_for_subject and 'items_json' in order_data:
             try:
-                r_admin = resend.Emails.send({
-                    "from": f"Varaha Jewels <{sender_alias}>" if '@' in sender_alias else "onboarding@resend.dev", # Resend requires verified domain or onboarding email
-                    "to": [admin_email],
-                    "subject": subject_admin,
-                    "html": body_admin
-                })
-                logger.info(f"Resend: Admin notification sent. ID: {r_admin.id}")
-            except Exception as e:
-                logger.error(f"Resend Error (Admin): {str(e)}")
-
-            # Send to Customer
-            if customer_email:
+                items_for_subject = json.loads(order_data['items_json'])
+            except:
+                items_for_subject = []
+        product_names = ', '.join([item.get('productName', item.get('name', '')) for item in items_for_subject if item.get('productName') or item.get('name')]) or 'Your Varaha Order'
+        # Truncate if too long
+        if len(product_names) > 60:
+            product_names = product_names[:57] + '...'
+        
+        subject_admin = f"New Order Received: {product_names}"
+        order_ctx = {
+            "order_id": order_data.get('order_id'),
+            "total_amount": order_data.get('total_amount', 0),
+            "customer_email": order_data.get('email', 'N/A'),
+            "customer_name": order_data.get('customer_name', 'Customer'),
+            "address": order_data.get('address'),
+            "city": order_data.get('city'),
+            "pincode": order_data.get('pincode')
+        }
+        body_admin = ORDER_ADMIN_HTML.format_map(order_ctx)
+        
+        # MIME objects are only needed for SMTP (Resend/SES take the HTML directly)
+        msg_admin = None
+        if use_smtp:
+            msg_admin = EmailMessage()
+            msg_admin['From'] = ORDER_FROM_HEADER
+            msg_admin['To'] = admin_email
+            msg_admin['Subject'] = subject_admin
+            msg_admin.set_content(body_admin, subtype='html', cte='quoted-printable')
+
+        # Customer Email Content
+        customer_email = order_data.get('email')
+        msg_customer = None
+        
+        if customer_email:
+            subject_customer = f"Order Confirmation - {product_names} | Varaha Jewels"
+            
+            # Generate tracking token for public tracking link
+            tracking_token = generate_tracking_token(str(order_data.get('order_id')))
+            tracking_url = f"{os.getenv('FRONTEND_URL', 'https://varahajewels.in')}/track/{order_data.get('order_id')}_{tracking_token}"
+            # Prepare items HTML
+            items_html = ""
+            items = order_data.get('items', [])
+            # If items not found, try to parse items_json
+            if not items and 'items_json' in order_data:
+                try:
+                    items = json.loads(order_data['items_json'])
+                except json.JSONDecodeError:
+                    logger.error("Failed to parse items_json")
+                    items = []
+            if items:
+                items_html += '<table style="width: 100%; border-collapse: collapse;">'
+                for item in items:
+                    name = item.get('productName', item.get('name', 'Product'))
+                    qty = item.get('quantity', 1)
+                    price = item.get('price', 0)
+                    items_html += ORDER_ITEM_ROW_HTML.format(name=name, qty_suffix=f' x{qty}' if qty > 1 else '', price=price)
+                items_html += '</table>'
+            else:
+                items_html = ORDER_NO_ITEMS_HTML.format_map(order_ctx)
+
+            body_customer = ORDER_CUSTOMER_HTML.format_map({
+                **order_ctx,
+                "items_html": items_html,
+                "tracking_url": tracking_url,
+                "order_url": f"{os.getenv('FRONTEND_URL', 'https://varahajewels.com')}/orders/{order_data.get('order_id')}"
+            })
+            
+            if use_smtp:
+                msg_customer = EmailMessage()
+                msg_customer['From'] = ORDER_FROM_HEADER
+                msg_customer['To'] = customer_email
+                msg_customer['Subject'] = subject_customer
+                msg_customer.set_content(body_customer, subtype='html', cte='quoted-printable')
+        
+
+        email_sent_to_customer = False
+
+        match email_provider:
+            # --- SEND VIA RESEND ---
+            case "resend":
+                if resend is None:
+                    raise RuntimeError("EMAIL_PROVIDER is 'resend' but the resend package is not installed")
+                resend.api_key = os.getenv("RESEND_API_KEY")
+                logger.info("Sending emails via Resend...")
+
+                # Send to Admin
                 try:
-                    r_customer = resend.Emails.send({
-                        "from": f"Varaha Jewels <{sender_alias}>" if '@' in sender_alias else "onboarding@resend.dev",
-                        "to": [customer_email],
-                        "subject": subject_customer,
-                        "html": body_customer
+                    r_admin = resend.Emails.send({
+                        "from": ORDER_FROM_HEADER if '@' in sender_alias else "onboarding@resend.dev", # Resend requires verified domain or onboarding email
+                        "to": [admin_email],
+                        "subject": subject_admin,
+                        "html": body_admin
                     })
-                    logger.info(f"Resend: Customer confirmation sent. ID: {r_customer.id}")
-
-                    # UPDATE DB STATUS: SUCCESS
-                    with Session(engine) as session:
-                        statement = select(Order).where(Order.order_id == order_data.get('order_id'))
-                        order_record = session.exec(statement).first()
-                        if order_record:
-                            order_record.email_status = "sent"
-                            session.add(order_record)
-                            session.commit()
-                            logger.info(f"Updated Order {order_record.order_id} email_status to 'sent'")
+                    logger.info("Resend: Admin notification sent. ID: %s", r_admin.id)
                 except Exception as e:
-                    logger.error(f"Resend Error (Customer): {str(e)}")
-                    raise e
+                    logger.error("Resend Error (Admin): %s", e)
 
-        # --- SEND VIA SES ---
-        elif email_provider == 'ses' and aws_access_key and aws_secret_key:
-            import boto3
-            from botocore.exceptions import ClientError
-            
-            logger.info("Sending emails via Amazon SES...")
-            
-            # Initialize SES Client
-            ses_client = boto3.client(
-                'ses',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
+                # Send to Customer
+                if customer_email:
+                    try:
+                        r_customer = resend.Emails.send({
+                            "from": ORDER_FROM_HEADER if '@' in sender_alias else "onboarding@resend.dev",
+                            "to": [customer_email],
+                            "subject": subject_customer,
+                            "html": body_customer
+                        })
+                        logger.info("Resend: Customer confirmation sent. ID: %s", r_customer.id)
+                        email_sent_to_customer = True
+                    except Exception as e:
+                        logger.error("Resend Error (Customer): %s", e)
+                        raise e
 
-            # Send to Admin
-            try:
-                ses_client.send_raw_email(
-                    Source=sender_alias,
-                    Destinations=[admin_email],
-                    RawMessage={'Data': msg_admin.as_string()}
+            # --- SEND VIA SES ---
+            case "ses":
+                logger.info("Sending emails via Amazon SES...")
+            
+                # Initialize SES Client
+                ses_client = boto3.client(
+                    'ses',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION
                 )
-                logger.info(f"SES: Admin notification sent to {admin_email}")
-            except ClientError as e:
-                logger.error(f"SES Error (Admin): {e.response['Error']['Message']}")
 
-            # Send to Customer
-            if msg_customer and customer_email:
+                # Admin + Customer go out in a single SendBulkTemplatedEmail call
+                # (one SES round-trip per order instead of one per recipient)
+                _ensure_ses_template(ses_client)
+                destinations = [{
+                    'Destination': {'ToAddresses': [admin_email]},
+                    'ReplacementTemplateData': json.dumps({"subject": subject_admin, "html": body_admin})
+                }]
+                if customer_email:
+                    destinations.append({
+                        'Destination': {'ToAddresses': [customer_email]},
+                        'ReplacementTemplateData': json.dumps({"subject": subject_customer, "html": body_customer})
+                    })
+
                 try:
-                    ses_client.send_raw_email(
-                        Source=sender_alias,
-                        Destinations=[customer_email],
-                        RawMessage={'Data': msg_customer.as_string()}
+                    response = ses_client.send_bulk_templated_email(
+                        Source=ORDER_FROM_HEADER,
+                        Template=SES_TEMPLATE_NAME,
+                        DefaultTemplateData=json.dumps({"subject": "", "html": ""}),
+                        Destinations=destinations
                     )
-                    logger.info(f"SES: Customer confirmation sent to {customer_email}")
-                    
-                    # UPDATE DB STATUS: SUCCESS
-                    with Session(engine) as session:
-                        statement = select(Order).where(Order.order_id == order_data.get('order_id'))
-                        order_record = session.exec(statement).first()
-                        if order_record:
-                            order_record.email_status = "sent"
-                            session.add(order_record)
-                            session.commit()
-                            logger.info(f"Updated Order {order_record.order_id} email_status to 'sent'")
-                            
                 except ClientError as e:
-                    logger.error(f"SES Error (Customer): {e.response['Error']['Message']}")
-                    raise e # Retrigger for failure handling
-                    
-        # --- SEND VIA SMTP (Fallback or Explicit) ---
-        else:
-            smtp_host = os.getenv("SMTP_HOST", "smtp.hostinger.com")
-            smtp_port = int(os.getenv("SMTP_PORT", "587"))
+                    logger.error("SES Error (Bulk): %s", e.response['Error']['Message'])
+                    if customer_email:
+                        raise e # Retrigger for failure handling
+                    response = {'Status': []}
+
+                statuses = response.get('Status', [])
+                if statuses:
+                    if statuses[0].get('Status') == 'Success':
+                        logger.info("SES: Admin notification sent to %s", admin_email)
+                    else:
+                        logger.error("SES Error (Admin): %s", statuses[0].get('Error'))
+
+                if len(destinations) > 1 and len(statuses) > 1:
+                    if statuses[1].get('Status') != 'Success':
+                        logger.error("SES Error (Customer): %s", statuses[1].get('Error'))
+                        raise Exception(f"SES customer send failed: {statuses[1].get('Error')}") # Retrigger for failure handling
+
+                    logger.info("SES: Customer confirmation sent to %s", customer_email)
+                    email_sent_to_customer = True
+
+            # --- SEND VIA SMTP (Fallback or Explicit) ---
+            case _:
+                smtp_host = os.getenv("SMTP_HOST", "smtp.hostinger.com")
+                smtp_port = int(os.getenv("SMTP_PORT", "587"))
+
+                # Serialize once; retries resend the same bytes instead of re-encoding the MIME tree
+                raw_admin = msg_admin.as_bytes(policy=email.policy.SMTP)
+                raw_customer = msg_customer.as_bytes(policy=email.policy.SMTP) if msg_customer else None
             
-            if not sender_email or not sender_password:
-                logger.warning("Email credentials not set. Skipping email notification.")
-            else:
                 # Retry logic for robust email sending
                 max_retries = 3
                 retry_delay = 2 # seconds
-                import time
-                
+            
                 for attempt in range(1, max_retries + 1):
                     try:
-                        logger.info(f"Connecting to SMTP: {smtp_host}:{smtp_port} (Attempt {attempt}/{max_retries})...")
-                        
+                        logger.info("Connecting to SMTP: %s:%s (Attempt %s/%s)...", smtp_host, smtp_port, attempt, max_retries)
+                    
                         if smtp_port == 465:
                             # SSL Connection with timeout
                             with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=30) as server:
                                 logger.info("SMTP SSL Connected. Logging in...")
                                 server.login(sender_email, sender_password)
                                 logger.info("SMTP Login Success. Sending email...")
-                                server.send_message(msg_admin)
-                                if msg_customer:
-                                    server.send_message(msg_customer)
+                                server.sendmail(sender_alias, [admin_email], raw_admin)
+                                if raw_customer:
+                                    server.sendmail(sender_alias, [customer_email], raw_customer)
                         else:
                             # TLS Connection (587) with timeout
                             with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
@@ -437,62 +649,55 @@ def send_order_notifications(order_data):
                                 server.starttls()
                                 logger.info("SMTP TLS Started. Logging in...")
                                 server.login(sender_email, sender_password)
-                                server.send_message(msg_admin)
-                                if msg_customer:
-                                    server.send_message(msg_customer)
-                                    
-                        logger.info(f"Email notifications sent to Admin ({admin_email}) and Customer ({customer_email})")
-                        
-                        # UPDATE DB STATUS: SUCCESS
-                        if customer_email:
-                            with Session(engine) as session:
-                                statement = select(Order).where(Order.order_id == order_data.get('order_id'))
-                                order_record = session.exec(statement).first()
-                                if order_record:
-                                    order_record.email_status = "sent"
-                                    session.add(order_record)
-                                    session.commit()
-                                    logger.info(f"Updated Order {order_record.order_id} email_status to 'sent'")
-                        
+                                server.sendmail(sender_alias, [admin_email], raw_admin)
+                                if raw_customer:
+                                    server.sendmail(sender_alias, [customer_email], raw_customer)
+                                
+                        logger.info("Email notifications sent to Admin (%s) and Customer (%s)", admin_email, customer_email)
+                    
+                        email_sent_to_customer = bool(customer_email)
+                    
                         # Break loop if successful
                         break
-                        
+                    
                     except smtplib.SMTPAuthenticationError as auth_err:
-                        logger.error(f"❌ SMTP Auth Error: {auth_err.smtp_code} - {auth_err.smtp_error}")
+                        logger.error("❌ SMTP Auth Error: %s - %s", auth_err.smtp_code, auth_err.smtp_error)
                         logger.error("Double check your EMAIL_FROM and EMAIL_PASSWORD in .env")
                         raise auth_err # Don't retry on auth error
-                        
+                    
                     except Exception as e:
-                        logger.error(f"❌ SMTP Connection Error (Attempt {attempt}): {str(e)}")
+                        logger.error("❌ SMTP Connection Error (Attempt %s): %s", attempt, e)
                         if attempt == max_retries:
                             raise e
                         time.sleep(retry_delay)
-    
+
+        # UPDATE DB STATUS: SUCCESS
+        if email_sent_to_customer:
+            _set_email_status(order_data.get('order_id'), "sent")
+
     except Exception as e:
-        logger.error(f"Failed to send email notification: {str(e)}")
+        logger.error("Failed to send email notification: %s", e)
         
+        _release_order_notification(order_data.get('order_id'))
+
         # UPDATE DB STATUS: FAILED
         try:
-            with Session(engine) as session:
-                statement = select(Order).where(Order.order_id == order_data.get('order_id'))
-                order_record = session.exec(statement).first()
-                if order_record:
-                    order_record.email_status = "failed"
-                    session.add(order_record)
-                    session.commit()
-                    logger.error(f"Updated Order {order_record.order_id} email_status to 'failed'")
+            _set_email_status(order_data.get('order_id'), "failed")
         except Exception as db_err:
-             logger.error(f"Failed to update DB status to failed: {str(db_err)}")
+             logger.error("Failed to update DB status to failed: %s", db_err)
         # Re-raise for test endpoint to catch
         if order_data.get('is_test'):
              raise e
 
-    # --- 2. Telegram Notification ---
+
+def _send_order_telegram(order_data):
+    """
+    Post the new-order summary to the admin Telegram chat.
+    """
     try:
-        bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        chat_id = TELEGRAM_CHAT_ID
         
-        if bot_token and chat_id:
+        if TELEGRAM_SEND_URL and chat_id:
             # Build items list for Telegram
             tg_items = order_data.get('items', [])
             if not tg_items and order_data.get('items_json'):
@@ -537,36 +742,52 @@ def send_order_notifications(order_data):
             ]
             full_address = ', '.join([p for p in address_parts if p])
 
-            message = (
-                f"🛍️ *NEW ORDER RECEIVED!*\n"
-                f"━━━━━━━━━━━━━━━━━━\n\n"
-                f"🆔 *Order ID:* `{order_data.get('order_id')}`\n\n"
-                f"👤 *Customer:* {order_data.get('customer_name', 'N/A')}\n"
-                f"📞 *Phone:* {order_data.get('phone', 'N/A')}\n"
-                f"📧 *Email:* {order_data.get('email', 'N/A')}\n\n"
-                f"📦 *Items:*\n{items_text}\n"
-                f"{discount_text}"
-                f"💰 *Total Amount:* ₹{order_data.get('total_amount', 0)}\n"
-                f"{pay_emoji} *Payment:* {pay_label}\n\n"
-                f"📍 *Delivery Address:*\n{full_address}\n\n"
-                f"━━━━━━━━━━━━━━━━━━"
+            message = ORDER_TELEGRAM_TEMPLATE.format(
+                order_id=order_data.get('order_id'),
+                customer_name=order_data.get('customer_name', 'N/A'),
+                phone=order_data.get('phone', 'N/A'),
+                email=order_data.get('email', 'N/A'),
+                items_text=items_text,
+                discount_text=discount_text,
+                total_amount=order_data.get('total_amount', 0),
+                pay_emoji=pay_emoji,
+                pay_label=pay_label,
+                full_address=full_address
             )
             
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
             payload = {
                 "chat_id": chat_id,
                 "text": message,
                 "parse_mode": "Markdown"
             }
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = requests.post(TELEGRAM_SEND_URL, json=payload, timeout=10)
             response.raise_for_status()
             logger.info("Telegram notification sent successfully")
         else:
             logger.warning("Telegram credentials not set. Skipping Telegram notification.")
             
     except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {str(e)}")
+        logger.error("Failed to send Telegram notification: %s", e)
+
+
+async def send_order_notifications_async(order_data):
+    """
+    Triggers email and Telegram notifications when a new order is received.
+    Runs as a FastAPI background task. Email and Telegram are independent
+    network waits, so they run concurrently in worker threads (total time
+    ~ max of the two instead of the sum).
+    """
+    if not order_data.get('is_test') and not _claim_order_notification(order_data.get('order_id')):
+        logger.info("Notifications already sent for Order: %s - skipping duplicate", order_data.get('order_id'))
+        return
+
+    _prepare_order_data(order_data)
+
+    await asyncio.gather(
+        asyncio.to_thread(_send_order_email, order_data),
+        asyncio.to_thread(_send_order_telegram, order_data)
+    )
 
 
 def send_shipping_notifications(order_data):
@@ -575,77 +796,57 @@ def send_shipping_notifications(order_data):
     """
     try:
         # Load Config
-        sender_email = os.getenv("EMAIL_USER") or os.getenv("EMAIL_SENDER")
-        sender_alias = os.getenv("EMAIL_FROM", sender_email)
-        email_provider = os.getenv("EMAIL_PROVIDER", "smtp").lower()
-        resend_api_key = os.getenv("RESEND_API_KEY")
+        sender_alias = SHIPPING_SENDER_ALIAS
+        email_provider = SHIPPING_EMAIL_PROVIDER
+        resend_api_key = RESEND_API_KEY
         
         customer_email = order_data.get('email')
         if not customer_email:
             logger.warning("No customer email found for shipping notification")
             return
 
+        # Bail out before rendering anything if Resend isn't configured
+        if email_provider != 'resend' or not resend_api_key or resend is None:
+            logger.warning("Shipping email skipped: Provider not Resend or keys missing.")
+            return
+
         subject = f"Your Order has been Shipped! - {order_data.get('order_id')} | Varaha Jewels"
         
-        tracking_url = f"{os.getenv('FRONTEND_URL', 'https://varahajewels.com')}/orders/{order_data.get('order_id')}"
+        tracking_url = f"{FRONTEND_URL}/orders/{order_data.get('order_id')}"
         
-        body_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Helvetica', sans-serif; background-color: #f4f1ea; margin: 0; padding: 0; }}
-                .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; border: 1px solid #e0d8c3; }}
-                .header {{ text-align: center; padding: 40px; border-bottom: 1px solid #f0e6d2; }}
-                .content {{ padding: 40px; text-align: center; }}
-                .btn {{ background-color: #1a1a1a; color: #c5a059; padding: 15px 30px; text-decoration: none; display: inline-block; margin-top: 20px; text-transform: uppercase; letter-spacing: 2px; }}
-                .details {{ background-color: #faf9f6; padding: 20px; margin: 20px 0; text-align: left; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <img src="https://res.cloudinary.com/dd5zrsmok/image/upload/v1766342264/logo_hvef6t.png" width="150" alt="Varaha Jewels">
-                </div>
-                <div class="content">
-                    <h2 style="font-family: 'Georgia', serif; color: #1a1a1a;">Your Order is on the way!</h2>
-                    <p style="color: #666; line-height: 1.6;">
-                        Great news, <strong>{order_data.get('customer_name')}</strong>! Your order items have been dispatched and are making their way to you.
-                    </p>
-                    
-                    <div class="details">
-                        <p><strong>Courier:</strong> {order_data.get('courier_name')}</p>
-                        <p><strong>Tracking Number (AWB):</strong> {order_data.get('awb_number')}</p>
-                    </div>
-
-                    <a href="{tracking_url}" class="btn">Track Your Order</a>
-                    
-                    <p style="color: #999; font-size: 12px; margin-top: 40px;">
-                        You can also track your shipment directly on the courier's website using the AWB number provided.
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        body_html = _SHIPPING_TMPL.render(order=order_data, tracking_url=tracking_url)
 
         # Resend Logic
-        if email_provider == 'resend' and resend_api_key:
-            import resend
-            resend.api_key = resend_api_key
-            r = resend.Emails.send({
-                "from": f"Varaha Jewels <{sender_alias}>" if '@' in sender_alias else "onboarding@resend.dev",
-                "to": [customer_email],
-                "subject": subject,
-                "html": body_html
-            })
-            logger.info(f"Shipping email sent via Resend. ID: {r.id}")
-            
-        else:
-            logger.warning("Shipping email skipped: Provider not Resend or keys missing.")
+        resend.api_key = resend_api_key
+        _submit_resend_email({
+            "from": f"Varaha Jewels <{sender_alias}>" if '@' in sender_alias else "onboarding@resend.dev",
+            "to": [customer_email],
+            "subject": subject,
+            "html": body_html
+        }, "Shipping email")
 
     except Exception as e:
-        logger.error(f"Failed to send shipping notification: {str(e)}")
+        logger.error("Failed to send shipping notification: %s", e)
+
+
+def _build_shipped(ctx):
+    return f"📦 Your Varaha Piece has been Shipped! - {ctx['order'].order_id}", _TRACKING_TMPLS["shipped"].render(**ctx)
+
+
+def _build_out_for_delivery(ctx):
+    return f"🚚 Your Package is Out for Delivery! - {ctx['order'].order_id}", _TRACKING_TMPLS["out_for_delivery"].render(**ctx)
+
+
+def _build_delivered(ctx):
+    return f"✨ Your Varaha Jewels have been Delivered! - {ctx['order'].order_id}", _TRACKING_TMPLS["delivered"].render(**ctx)
+
+
+# Tracking status -> (subject, html) builder; statuses not listed send nothing
+_TRACKING_BUILDERS = {
+    "shipped": _build_shipped,
+    "out_for_delivery": _build_out_for_delivery,
+    "delivered": _build_delivered,
+}
 
 
 def send_tracking_notification(order, status: str):
@@ -658,128 +859,51 @@ def send_tracking_notification(order, status: str):
     - out_for_delivery: "Your package is out for delivery today."
     - delivered: "Delivered! Hope you love your jewels."
     """
-    import hashlib
-    
+    builder = _TRACKING_BUILDERS.get(status)
+    if not builder:
+        # No notification for other statuses
+        return
+
     try:
         # Config
-        sender_alias = os.getenv("EMAIL_FROM", os.getenv("EMAIL_USER"))
-        resend_api_key = os.getenv("RESEND_API_KEY")
-        email_provider = os.getenv("EMAIL_PROVIDER", "resend").lower()
-        frontend_url = os.getenv("FRONTEND_URL", "https://varahajewels.in")
+        sender_alias = TRACKING_SENDER_ALIAS
+        resend_api_key = RESEND_API_KEY
+        email_provider = TRACKING_EMAIL_PROVIDER
+        frontend_url = FRONTEND_URL
         
         customer_email = order.email
         if not customer_email:
-            logger.warning(f"No email for order {order.order_id} - skipping notification")
+            logger.warning("No email for order %s - skipping notification", order.order_id)
+            return
+
+        # Bail out before rendering anything if Resend isn't configured
+        if email_provider != 'resend' or not resend_api_key or resend is None:
+            logger.warning("Tracking notification skipped: Provider not configured")
             return
         
         # Generate tracking token
-        tracking_secret = os.getenv("TRACKING_SECRET", "varaha_track_secret_2026")
-        tracking_token = hashlib.sha256(f"{order.order_id}_{tracking_secret}".encode()).hexdigest()[:16]
+        tracking_token = generate_tracking_token(order.order_id)
         tracking_url = f"{frontend_url}/track/{order.order_id}_{tracking_token}"
         
-        subject = None
-        body_html = None
+        ctx = {
+            "order": order,
+            "first_name": (order.customer_name or "").strip().partition(" ")[0] or 'Customer',
+            "tracking_url": tracking_url,
+            "frontend_url": frontend_url
+        }
         
         # Status-specific templates
-        if status == "shipped":
-            subject = f"📦 Your Varaha Piece has been Shipped! - {order.order_id}"
-            body_html = f"""
-            <div style="font-family: 'Helvetica', sans-serif; max-width: 600px; margin: 0 auto; background: #fff; border: 1px solid #e0d8c3;">
-                <div style="text-align: center; padding: 30px; background: linear-gradient(135deg, #1a1a1a 0%, #333 100%);">
-                    <img src="https://res.cloudinary.com/dd5zrsmok/image/upload/v1766342264/logo_hvef6t.png" width="150" alt="Varaha Jewels">
-                </div>
-                <div style="padding: 40px; text-align: center;">
-                    <h2 style="font-family: 'Georgia', serif; color: #1a1a1a; margin-bottom: 20px;">Your Treasure is on the Way! 📦</h2>
-                    <p style="color: #666; line-height: 1.8; font-size: 16px;">
-                        Namaste <strong>{order.customer_name.split()[0] if order.customer_name else 'Customer'}</strong>,<br><br>
-                        Your Varaha piece has been carefully packed and shipped. It's now making its way to you!
-                    </p>
-                    
-                    <div style="background: #faf9f6; padding: 20px; margin: 30px 0; border: 1px solid #e8e3d6; text-align: left;">
-                        <p style="margin: 8px 0;"><strong>AWB Number:</strong> {order.awb_number or 'Pending'}</p>
-                        <p style="margin: 8px 0;"><strong>Courier:</strong> {order.courier_name or 'RapidShyp'}</p>
-                    </div>
-                    
-                    <a href="{tracking_url}" style="background: #c5a059; color: #fff; padding: 15px 40px; text-decoration: none; display: inline-block; font-size: 14px; text-transform: uppercase; letter-spacing: 2px; margin-top: 20px;">
-                        Track Your Order
-                    </a>
-                </div>
-                <div style="text-align: center; padding: 20px; background: #f4f1ea; font-size: 11px; color: #888;">
-                    © 2025 Varaha Jewels | Where Heritage Meets Royalty
-                </div>
-            </div>
-            """
-            
-        elif status == "out_for_delivery":
-            subject = f"🚚 Your Package is Out for Delivery! - {order.order_id}"
-            body_html = f"""
-            <div style="font-family: 'Helvetica', sans-serif; max-width: 600px; margin: 0 auto; background: #fff; border: 1px solid #e0d8c3;">
-                <div style="text-align: center; padding: 30px; background: linear-gradient(135deg, #c5a059 0%, #a8893c 100%);">
-                    <img src="https://res.cloudinary.com/dd5zrsmok/image/upload/v1766342264/logo_hvef6t.png" width="150" alt="Varaha Jewels">
-                </div>
-                <div style="padding: 40px; text-align: center;">
-                    <h2 style="font-family: 'Georgia', serif; color: #1a1a1a; margin-bottom: 20px;">Almost There! 🚚</h2>
-                    <p style="color: #666; line-height: 1.8; font-size: 16px;">
-                        Exciting news <strong>{order.customer_name.split()[0] if order.customer_name else 'Customer'}</strong>!<br><br>
-                        Your Varaha jewellery is <strong style="color: #c5a059;">out for delivery today</strong>. Please ensure someone is available to receive it.
-                    </p>
-                    
-                    <div style="background: #e8f5e9; padding: 20px; margin: 30px 0; border: 1px solid #c8e6c9; border-radius: 8px;">
-                        <p style="color: #2e7d32; font-size: 18px; margin: 0;">📍 Delivery Expected Today</p>
-                    </div>
-                    
-                    <a href="{tracking_url}" style="background: #1a1a1a; color: #c5a059; padding: 15px 40px; text-decoration: none; display: inline-block; font-size: 14px; text-transform: uppercase; letter-spacing: 2px;">
-                        Track Live
-                    </a>
-                </div>
-            </div>
-            """
-            
-        elif status == "delivered":
-            subject = f"✨ Your Varaha Jewels have been Delivered! - {order.order_id}"
-            body_html = f"""
-            <div style="font-family: 'Helvetica', sans-serif; max-width: 600px; margin: 0 auto; background: #fff; border: 1px solid #e0d8c3;">
-                <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #1a5e3a 0%, #2e7d32 100%);">
-                    <span style="font-size: 60px;">✨</span>
-                </div>
-                <div style="padding: 40px; text-align: center;">
-                    <h2 style="font-family: 'Georgia', serif; color: #1a1a1a; margin-bottom: 20px;">Your Treasure has Arrived!</h2>
-                    <p style="color: #666; line-height: 1.8; font-size: 16px;">
-                        Dear <strong>{order.customer_name.split()[0] if order.customer_name else 'Customer'}</strong>,<br><br>
-                        We hope your Varaha piece brings you immense joy and becomes a cherished part of your collection.
-                    </p>
-                    
-                    <div style="background: #fff8e1; padding: 25px; margin: 30px 0; border: 1px solid #ffe082; border-radius: 8px;">
-                        <p style="color: #f57c00; font-size: 16px; margin: 0 0 10px 0;">💭 We'd love your feedback!</p>
-                        <p style="color: #666; font-size: 14px; margin: 0;">Share your experience and tag us on Instagram @varahajewels</p>
-                    </div>
-                    
-                    <a href="{frontend_url}/account" style="background: #c5a059; color: #fff; padding: 15px 40px; text-decoration: none; display: inline-block; font-size: 14px; text-transform: uppercase; letter-spacing: 2px;">
-                        Rate Your Purchase
-                    </a>
-                </div>
-                <div style="text-align: center; padding: 20px; background: #f4f1ea; font-size: 11px; color: #888;">
-                    Thank you for choosing Varaha Jewels ♦ Where Heritage Meets Royalty
-                </div>
-            </div>
-            """
-        else:
-            # No notification for other statuses
-            return
+        subject, body_html = builder(ctx)
         
         # Send via Resend
-        if email_provider == 'resend' and resend_api_key:
-            resend.api_key = resend_api_key
-            result = resend.Emails.send({
-                "from": f"Varaha Jewels <{sender_alias}>" if sender_alias and '@' in sender_alias else "onboarding@resend.dev",
-                "to": [customer_email],
-                "subject": subject,
-                "html": body_html
-            })
-            logger.info(f"Tracking notification ({status}) sent to {customer_email}. ID: {result.id}")
-        else:
-            logger.warning(f"Tracking notification skipped: Provider not configured")
+        resend.api_key = resend_api_key
+        _submit_resend_email({
+            "from": f"Varaha Jewels <{sender_alias}>" if sender_alias and '@' in sender_alias else "onboarding@resend.dev",
+            "to": [customer_email],
+            "subject": subject,
+            "html": body_html
+        }, f"Tracking notification ({status})")
             
     except Exception as e:
-        logger.error(f"Failed to send tracking notification ({status}): {str(e)}")
+        logger.error("Failed to send tracking notification (%s): %s", status, e)
 
@@ -1,8 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import json
 import re
+import orjson
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,6 +20,16 @@ class RapidShypClient:
         if not self.api_key:
             logger.warning("RAPIDSHYP_API_KEY is not set in environment variables.")
 
+        # Persistent session: reuses TCP/TLS connections across API calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504], raise_on_status=False)
+        )
+        self.session.mount("https://", adapter)
+        self.session.headers.update(self._get_headers())
+
     def _get_headers(self):
         return {
             "rapidshyp-token": self.api_key,
@@ -26,24 +40,59 @@ class RapidShypClient:
         url = f"{self.BASE_URL}/{endpoint}"
         try:
             if method == "POST":
-                logger.info(f"Sending POST request to {url}")
-                # logger.info(f"Payload: {json.dumps(payload, indent=2)}") # Debug only
-                response = requests.post(url, json=payload, headers=self._get_headers(), timeout=15)
+                logger.info("Sending POST request to %s", url)
+                # logger.debug("Payload: %s", json.dumps(payload, indent=2)) # Debug only
+                # Content-Type is already set on the session; send pre-encoded bytes
+                body = orjson.dumps(payload) if payload is not None else None
+                response = self.session.post(url, data=body, timeout=15)
             else:
-                logger.info(f"Sending GET request to {url}")
-                response = requests.get(url, params=params, headers=self._get_headers(), timeout=15)
+                logger.info("Sending GET request to %s", url)
+                response = self.session.get(url, params=params, timeout=15)
             
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except requests.exceptions.Timeout:
-            logger.error(f"RapidShyp API Timeout: Request to {url} exceeded 15 seconds")
+            logger.error("RapidShyp API Timeout: Request to %s exceeded 15 seconds", url)
             return {"status": "error", "error": "Request timeout - RapidShyp API is taking too long"}
         except requests.exceptions.RequestException as e:
-            logger.error(f"RapidShyp API Request Error: {e}")
+            logger.error("RapidShyp API Request Error: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response Body: {e.response.text}")
+                logger.error("Response Body: %s", e.response.text)
                 return {"status": "error", "error": str(e), "details": e.response.text}
             return {"status": "error", "error": str(e)}
+        except orjson.JSONDecodeError as e:
+            logger.error("RapidShyp API returned invalid JSON: %s", e)
+            return {"status": "error", "error": "Invalid JSON response from RapidShyp", "details": response.text}
+
+    @staticmethod
+    def _item_name_and_sku(item):
+        """
+        Resolve the display name and RapidShyp SKU for a cart/order item.
+        Supports both camelCase (frontend cart) and snake_case keys.
+        """
+        name = (
+            item.get("name") or
+            item.get("productName") or
+            item.get("product_name") or
+            "Jewellery Item"
+        )
+        variant_label = item.get("variantName") or item.get("variant") or item.get("variantId") or ""
+        full_name = f"{name} - {variant_label}" if variant_label else name
+
+        # Build digit-only SKU: VJ-{last 10 digits of productId}-{last 4 unique digits of variantId}
+        product_id = item.get("productId") or item.get("product_id") or ""
+        variant_id = item.get("variantId") or item.get("variant_id") or ""
+        sku = item.get("sku") or ""
+        if not sku:
+            pid_digits = re.sub(r'\D+', '', product_id)[-10:]
+            vid_digits = re.sub(r'\D+', '', variant_id)
+            if pid_digits and vid_digits and vid_digits[-4:] != pid_digits[-4:]:
+                sku = f"VJ-{pid_digits}-{vid_digits[-4:]}"
+            elif pid_digits:
+                sku = f"VJ-{pid_digits}"
+            else:
+                sku = "VJ-0000"
+        return full_name, sku
 
     def check_serviceability(self, pickup_pincode, delivery_pincode, weight, value, mode="COD"):
         """
@@ -75,58 +124,32 @@ class RapidShypClient:
         
         # Construct Shipping Address
         # Splitting address lines if too long or just using address1
-        address = order_data.get("address", "")
+        address = order_data.get("address") or ""
+        address_line1, address_line2 = address[:99] or "Address Not Provided", address[99:199]
+        first_name, _, last_name = (order_data.get("customer_name") or "").partition(" ")
         shipping_address = {
-            "firstName": order_data.get("customer_name", "").split(" ")[0],
-            "lastName": " ".join(order_data.get("customer_name", "").split(" ")[1:]) or ".",
-            "addressLine1": address[:99] if address else "Address Not Provided",
-            "addressLine2": address[99:199] if len(address) > 99 else "",
+            "firstName": first_name,
+            "lastName": last_name or ".",
+            "addressLine1": address_line1,
+            "addressLine2": address_line2,
             "pinCode": str(order_data.get("pincode")),
             "email": order_data.get("email"),
             "phone": order_data.get("phone")
         }
 
-        # Billing defaults to Shipping
-        billing_address = shipping_address.copy()
-
         # Items
-        order_items = []
-        for item in order_data.get("items", []):
-            # Support both camelCase (frontend cart) and snake_case keys
-            name = (
-                item.get("name") or
-                item.get("productName") or
-                item.get("product_name") or
-                "Jewellery Item"
-            )
-            variant_label = item.get("variantName") or item.get("variant") or item.get("variantId") or ""
-            if variant_label:
-                full_name = f"{name} - {variant_label}"
-            else:
-                full_name = name
-
-            # Build digit-only SKU: VJ-{last 10 digits of productId}-{last 4 unique digits of variantId}
-            product_id = item.get("productId") or item.get("product_id") or ""
-            variant_id = item.get("variantId") or item.get("variant_id") or ""
-            sku = item.get("sku") or ""
-            if not sku:
-                pid_digits = re.sub(r'\D+', '', product_id)[-10:]
-                vid_digits = re.sub(r'\D+', '', variant_id)
-                if pid_digits and vid_digits and vid_digits[-4:] != pid_digits[-4:]:
-                    sku = f"VJ-{pid_digits}-{vid_digits[-4:]}"
-                elif pid_digits:
-                    sku = f"VJ-{pid_digits}"
-                else:
-                    sku = "VJ-0000"
-
-            order_items.append({
+        order_items = [
+            {
                 "itemName": full_name[:199],
                 "sku": sku[:50],
                 "units": int(item.get("quantity", 1)),
                 "unitPrice": float(item.get("price", 0)),
                 "tax": 0.0,
                 "productWeight": 0.5
-            })
+            }
+            for item in order_data.get("items", [])
+            for full_name, sku in (self._item_name_and_sku(item),)
+        ]
 
         payload = {
             "orderId": str(order_data.get("orderId")),
@@ -134,7 +157,7 @@ class RapidShypClient:
             "storeName": "DEFAULT",
             "billingIsShipping": True,
             "shippingAddress": shipping_address,
-            "billingAddress": billing_address,
+            "billingAddress": shipping_address, # Billing defaults to Shipping (same dict, nothing mutates it)
             "orderItems": order_items,
             "paymentMethod": "COD" if order_data.get("payment_method") == "COD" else "PREPAID",
             "packageDetails": {
@@ -171,37 +194,19 @@ class RapidShypClient:
             delivery_address_name: String name of the WAREHOUSE to return to.
         """
         
-        order_items = []
-        for item in return_data.get("items", []):
-            name = (
-                item.get("name") or
-                item.get("productName") or
-                item.get("product_name") or
-                "Jewellery Item"
-            )
-            variant_label = item.get("variantName") or item.get("variant") or item.get("variantId") or ""
-            full_name = f"{name} - {variant_label}" if variant_label else name
-
-            product_id = item.get("productId") or item.get("product_id") or ""
-            variant_id = item.get("variantId") or item.get("variant_id") or ""
-            sku = item.get("sku") or ""
-            if not sku:
-                pid_digits = re.sub(r'\D+', '', product_id)[-10:]
-                vid_digits = re.sub(r'\D+', '', variant_id)
-                if pid_digits and vid_digits and vid_digits[-4:] != pid_digits[-4:]:
-                    sku = f"VJ-{pid_digits}-{vid_digits[-4:]}"
-                elif pid_digits:
-                    sku = f"VJ-{pid_digits}"
-                else:
-                    sku = "VJ-0000"
+        pickup_address = pickup_location.get("address") or ""
 
-            order_items.append({
+        order_items = [
+            {
                 "itemName": full_name[:199],
                 "sku": sku[:50],
                 "units": int(item.get("quantity", 1)),
                 "unitPrice": float(item.get("price", 0)),
                 "tax": 0.0,
-            })
+            }
+            for item in return_data.get("items", [])
+            for full_name, sku in (self._item_name_and_sku(item),)
+        ]
 
         payload = {
             "orderId": str(return_data.get("orderId")),
@@ -213,8 +218,8 @@ class RapidShypClient:
                 "pickup_customer_name": pickup_location.get("name", "Customer"),
                 "pickup_phone": pickup_location.get("phone"),
                 "pickup_email": pickup_location.get("email"),
-                "pickup_address": pickup_location.get("address", "")[:99],
-                "pickup_address_2": "",
+                "pickup_address": pickup_address[:99],
+                "pickup_address_2": pickup_address[99:199],
                 "pickup_pincode": str(pickup_location.get("pincode"))
             },
             "orderItems": order_items,
@@ -240,6 +245,17 @@ class RapidShypClient:
             
         return self._make_request("POST", "track_order", payload=payload)
 
+    def track_orders(self, awbs, max_workers=8):
+        """
+        Track several AWBs concurrently over the pooled session.
+        Returns results in the same order as `awbs`.
+        """
+        awbs = list(awbs)
+        if not awbs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(awbs))) as executor:
+            return list(executor.map(lambda awb: self.track_order(awb=awb), awbs))
+
     def create_pickup_location(self, location_data):
         """
         Create a new pickup location (Warehouse).
@@ -1,17 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Query, Response
 from sqlmodel import Session, select
+from sqlalchemy import func
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import asyncio
 import json
 
 # Internal Imports
-from database import get_session
-from models import HeroSlide, CreatorVideo, OrderReturn, ProductVariant, Inventory, AdminUser
+from database import get_session, get_read_session
+from models import HeroSlide, CreatorVideo, OrderReturn, Product, ProductVariant, Inventory, AdminUser
 from dependencies import oauth2_scheme, get_current_user, get_current_admin
 from supabase_utils import upload_file_to_supabase
+from cache_utils import TTLCache
 
 router = APIRouter()
 
+# Public storefront content: cached briefly, cleared on every admin write
+# (keyed by the limit/offset page)
+hero_cache = TTLCache(ttl=30, maxsize=16)
+creators_cache = TTLCache(ttl=30, maxsize=16)
+
+# Base list statements built once at import
+_HERO_STMT = select(HeroSlide).order_by(HeroSlide.id)
+_CREATOR_STMT = select(CreatorVideo).order_by(CreatorVideo.id)
+
+# List endpoints return a bounded page by default; the full row count goes in
+# X-Total-Count so clients can page through the rest with offset.
+PAGE_LIMIT_DEFAULT = 100
+PAGE_LIMIT_MAX = 500
+
+def _paged(session: Session, query, limit: int, offset: int):
+    """One page of query plus the total number of rows it matches."""
+    total = session.exec(select(func.count()).select_from(query.order_by(None).subquery())).one()
+    return session.exec(query.offset(offset).limit(limit)).all(), total
+
 from cloudinary_utils import upload_video_to_cloudinary, upload_image_to_cloudinary, upload_audio_to_cloudinary
 
 @router.post("/api/upload")
@@ -20,16 +42,20 @@ async def upload_file(
     current_user: AdminUser = Depends(get_current_admin)
 ):
     # Route based on content type - USE CLOUDINARY for images, videos, and audio
-    file_content = await file.read()
+    # The decision needs only the header; the body is never read here. Cloudinary
+    # gets the spooled upload itself and streams it.
+    content_type = file.content_type or ""
     
-    if file.content_type and "video" in file.content_type:
-        url = upload_video_to_cloudinary(file_content)
-    elif file.content_type and "audio" in file.content_type:
+    # The Cloudinary SDK is blocking, so uploads run on a worker thread
+    # instead of stalling the event loop
+    if "video" in content_type:
+        url = await asyncio.to_thread(upload_video_to_cloudinary, file.file)
+    elif "audio" in content_type:
         # Upload audio files (music)
-        url = upload_audio_to_cloudinary(file_content)
+        url = await asyncio.to_thread(upload_audio_to_cloudinary, file.file)
     else:
         # Upload images to Cloudinary with WebP compression
-        url = upload_image_to_cloudinary(file_content, folder="ciplx_images")
+        url = await asyncio.to_thread(upload_image_to_cloudinary, file.file, folder="ciplx_images")
 
     if not url:
         raise HTTPException(status_code=500, detail="Upload failed")
@@ -79,7 +105,7 @@ def manual_migration(current_user: AdminUser = Depends(get_current_admin)):
 # --- Hero Slides ---
 
 @router.post("/api/content/hero")
-def create_hero_slide(
+async def create_hero_slide(
     title: str = Form(...),
     subtitle: str = Form(...),
     link_text: str = Form(...),
@@ -92,15 +118,15 @@ def create_hero_slide(
     current_user: AdminUser = Depends(get_current_admin)
 ):
     try:
-        # Upload images to Supabase
+        # Upload images to Supabase (desktop + mobile in parallel)
         print(f"Received hero upload: {title}")
-        image_url = upload_file_to_supabase(image_file)
+        uploads = [asyncio.to_thread(upload_file_to_supabase, image_file)]
+        if mobile_image_file:
+            uploads.append(asyncio.to_thread(upload_file_to_supabase, mobile_image_file))
+        image_url, *rest = await asyncio.gather(*uploads)
+        mobile_image_url = rest[0] if rest else None
         if not image_url:
             raise Exception("Main image upload failed")
-            
-        mobile_image_url = None
-        if mobile_image_file:
-            mobile_image_url = upload_file_to_supabase(mobile_image_file)
 
         slide = HeroSlide(
             title=title,
@@ -115,7 +141,7 @@ def create_hero_slide(
         
         session.add(slide)
         session.commit()
-        session.refresh(slide)
+        hero_cache.clear()
         print(f"Hero upload: Success! Slide ID = {slide.id}")
         return slide
     except Exception as e:
@@ -126,8 +152,14 @@ def create_hero_slide(
         raise HTTPException(status_code=500, detail=f"Hero slide creation failed: {str(e)}")
 
 @router.get("/api/content/hero")
-def get_hero_slides(session: Session = Depends(get_session)):
-    slides = session.exec(select(HeroSlide)).all()
+def get_hero_slides(
+    response: Response,
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_read_session)
+):
+    slides, total = hero_cache.get_or_load((limit, offset), lambda: _paged(session, _HERO_STMT, limit, offset))
+    response.headers["X-Total-Count"] = str(total)
     return slides
 
 @router.delete("/api/content/hero/{slide_id}")
@@ -141,13 +173,20 @@ def delete_hero_slide(
         raise HTTPException(status_code=404, detail="Slide not found")
     session.delete(slide)
     session.commit()
+    hero_cache.clear()
     return {"ok": True}
 
 # --- Creator Videos ---
 
 @router.get("/api/content/creators")
-def get_creator_videos(session: Session = Depends(get_session)):
-    videos = session.exec(select(CreatorVideo)).all()
+def get_creator_videos(
+    response: Response,
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_read_session)
+):
+    videos, total = creators_cache.get_or_load((limit, offset), lambda: _paged(session, _CREATOR_STMT, limit, offset))
+    response.headers["X-Total-Count"] = str(total)
     return videos
 
 @router.post("/api/content/creators")
@@ -164,8 +203,7 @@ async def create_creator_video(
     try:
         # Upload video to Cloudinary
         print(f"Received upload request for {name}")
-        file_content = await video_file.read()
-        video_url = upload_video_to_cloudinary(file_content)
+        video_url = await asyncio.to_thread(upload_video_to_cloudinary, video_file.file)
         
         if not video_url:
             raise Exception("Cloudinary upload failed")
@@ -183,7 +221,7 @@ async def create_creator_video(
 
         session.add(video)
         session.commit()
-        session.refresh(video)
+        creators_cache.clear()
         return video
     except Exception as e:
         print(f"Error in upload: {e}")
@@ -201,6 +239,7 @@ def delete_creator_video(
         raise HTTPException(status_code=404, detail="Video not found")
     session.delete(video)
     session.commit()
+    creators_cache.clear()
     return {"ok": True}
 
 # --- Inventory & Variants (Admin) ---
@@ -208,15 +247,21 @@ def delete_creator_video(
 @router.get("/api/products/{product_id}/variants", response_model=List[ProductVariant])
 def get_product_variants(
     product_id: str,
+    response: Response,
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    offset: int = Query(0, ge=0),
     session: Session = Depends(get_session)
 ):
-    """Get all variants for a product"""
-    variants = session.exec(
+    """Get available variants for a product (total count in X-Total-Count)"""
+    variants, total = _paged(
+        session,
         select(ProductVariant)
         .where(ProductVariant.product_id == product_id)
         .where(ProductVariant.is_available == True)
-    ).all()
-    
+        .order_by(ProductVariant.id),
+        limit, offset
+    )
+    response.headers["X-Total-Count"] = str(total)
     return variants
 
 @router.post("/api/products/{product_id}/variants", response_model=ProductVariant)
@@ -244,10 +289,9 @@ def add_product_variant(
     )
     
     session.add(new_variant)
-    session.commit()
-    session.refresh(new_variant)
+    session.flush()  # assigns new_variant.id without committing
     
-    # Create inventory entry
+    # Create inventory entry (same transaction: no orphaned variant if this fails)
     inventory = Inventory(
         variant_id=new_variant.id,
         stock=new_variant.stock,
@@ -279,7 +323,6 @@ def update_variant(
     
     session.add(variant)
     session.commit()
-    session.refresh(variant)
     
     return variant
 
@@ -310,25 +353,24 @@ def get_inventory(
         select(Inventory).where(Inventory.product_id == product_id)
     ).first()
     
-    # Check variant inventories
-    variants = session.exec(
-        select(ProductVariant).where(ProductVariant.product_id == product_id)
+    # Check variant inventories (one JOIN instead of a query per variant)
+    variant_rows = session.exec(
+        select(ProductVariant, Inventory)
+        .join(Inventory, Inventory.variant_id == ProductVariant.id)
+        .where(ProductVariant.product_id == product_id)
     ).all()
     
-    variant_inventories = []
-    for variant in variants:
-        inv = session.exec(
-            select(Inventory).where(Inventory.variant_id == variant.id)
-        ).first()
-        if inv:
-            variant_inventories.append({
-                "variant_id": variant.id,
-                "variant_name": variant.name,
-                "sku": variant.sku,
-                "stock": inv.stock,
-                "reserved": inv.reserved,
-                "available": inv.available
-            })
+    variant_inventories = [
+        {
+            "variant_id": variant.id,
+            "variant_name": variant.name,
+            "sku": variant.sku,
+            "stock": inv.stock,
+            "reserved": inv.reserved,
+            "available": inv.available
+        }
+        for variant, inv in variant_rows
+    ]
     
     return {
         "product_id": product_id,
@@ -343,17 +385,21 @@ def get_inventory(
 
 @router.get("/api/returns", response_model=List[OrderReturn])
 def get_all_returns(
+    response: Response,
     status: Optional[str] = None,
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    offset: int = Query(0, ge=0),
     session: Session = Depends(get_session),
     current_user: AdminUser = Depends(get_current_admin)
 ):
-    """Get all return requests (Admin only)"""
+    """Get return requests, newest first (Admin only). Total count in X-Total-Count."""
     query = select(OrderReturn)
     
     if status:
         query = query.where(OrderReturn.status == status)
     
-    returns = session.exec(query.order_by(OrderReturn.created_at.desc())).all()
+    returns, total = _paged(session, query.order_by(OrderReturn.created_at.desc()), limit, offset)
+    response.headers["X-Total-Count"] = str(total)
     return returns
 
 @router.put("/api/returns/{return_id}")
@@ -1,20 +1,111 @@
 from fastapi import APIRouter, Depends, Request
 from sqlmodel import Session, select
 from datetime import datetime
+import asyncio
+import contextlib
 import hashlib
+import os
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Internal Imports
-from database import get_session
+from database import get_session, get_read_session, engine
 from models import VisitorLog
 from pydantic import BaseModel
-from sqlalchemy import func, text
+from sqlalchemy import func, text, bindparam
+from cache_utils import TTLCache
 
 router = APIRouter()
 
+# Keyed BLAKE2b for visitor IPs: faster than SHA-256 for short inputs, and the
+# secret key stops anyone from brute-forcing the IPv4 space back out of ip_hash.
+# Falls back to the JWT secret so hashes stay stable across workers/restarts.
+# (BLAKE2b keys are capped at 64 bytes, hence the SHA-256 of the salt.)
+_IP_HASH_SALT = os.getenv("IP_HASH_SALT") or os.getenv("JWT_SECRET_KEY") or os.getenv("SECRET_KEY")
+if not _IP_HASH_SALT:
+    logger.warning("IP_HASH_SALT/JWT_SECRET_KEY/SECRET_KEY not set: visitor IP hashes use a public default key and can be reversed")
+    _IP_HASH_SALT = "varaha-ip-salt"
+_IP_HASH_KEY = hashlib.sha256(_IP_HASH_SALT.encode()).digest()
+
+# Dashboard stats tolerate being a few seconds old: one refresh per window,
+# everyone else gets the previous result while it runs
+analytics_cache = TTLCache(ttl=30, maxsize=1, stale_while_revalidate=True)
+
+# --- Batched visit writes ---
+# track_visit only enqueues; a single background task drains the queue and
+# writes up to VISIT_BATCH_SIZE rows per commit (or whatever arrived within
+# VISIT_FLUSH_INTERVAL seconds).
+VISIT_QUEUE_MAX = 10_000
+VISIT_BATCH_SIZE = 500
+VISIT_FLUSH_INTERVAL = 1.0
+
+_visit_queue: asyncio.Queue = asyncio.Queue(maxsize=VISIT_QUEUE_MAX)
+_visit_flusher: asyncio.Task = None
+
+def _write_visits(batch: list):
+    """Insert a batch of VisitorLog mappings in one transaction (runs in a worker thread)."""
+    with Session(engine) as session:
+        session.bulk_insert_mappings(VisitorLog, batch)
+        session.commit()
+
+async def _write_batch(batch: list):
+    try:
+        await asyncio.to_thread(_write_visits, batch)
+    except Exception as e:
+        logger.error("Failed to write %d visit logs: %s", len(batch), e)
+
+async def _flush_visits():
+    loop = asyncio.get_running_loop()
+    batch = []
+    try:
+        while True:
+            batch = [await _visit_queue.get()]
+            deadline = loop.time() + VISIT_FLUSH_INTERVAL
+            while len(batch) < VISIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_visit_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Shielded so a shutdown cancel waits for the in-flight write
+            write, batch = asyncio.ensure_future(_write_batch(batch)), []
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await write
+                raise
+    except asyncio.CancelledError:
+        # Cancelled while collecting: write the rows already taken off the queue
+        if batch:
+            await _write_batch(batch)
+        raise
+
+def start_visit_flusher():
+    global _visit_flusher
+    if _visit_flusher is None or _visit_flusher.done():
+        _visit_flusher = asyncio.create_task(_flush_visits())
+
+async def stop_visit_flusher():
+    """Stop the flusher (letting it write its current batch), then write whatever is still queued."""
+    global _visit_flusher
+    if _visit_flusher is not None:
+        _visit_flusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _visit_flusher
+        _visit_flusher = None
+    batch = []
+    while not _visit_queue.empty():
+        batch.append(_visit_queue.get_nowait())
+    if batch:
+        await _write_batch(batch)
+
+# Built once at import; SQLAlchemy's compiled cache then reuses the SQL string
+_LOGS_STMT = select(VisitorLog).order_by(VisitorLog.timestamp.desc()).limit(bindparam("n"))
+
 class VisitRequest(BaseModel):
     path: str
 
@@ -60,7 +151,7 @@ async def track_visit(
         return {"status": "skipped", "reason": "localhost"}
     
     # Hash IP for privacy
-    ip_hash = hashlib.sha256(client_ip.encode()).hexdigest()
+    ip_hash = hashlib.blake2b(client_ip.encode(), key=_IP_HASH_KEY, digest_size=16).hexdigest()
     
     # Fetch geo-location
     geo = get_geo_from_ip(client_ip)
@@ -83,24 +174,31 @@ async def track_visit(
     except Exception as e:
         logger.warning(f"Blocked region check failed: {e}")
     
-    # Create log entry
-    log = VisitorLog(
-        ip_hash=ip_hash,
-        path=visit_data.path,
-        date=datetime.utcnow().strftime("%Y-%m-%d"),
-        city=geo.get("city"),
-        state=geo.get("state"),
-        country=geo.get("country")
-    )
-    
-    session.add(log)
-    session.commit()
+    # Queue log entry; the flusher writes it with the next batch
+    now = datetime.utcnow()
+    try:
+        _visit_queue.put_nowait({
+            "ip_hash": ip_hash,
+            "path": visit_data.path,
+            "timestamp": now,
+            "date": now.date(),
+            "city": geo.get("city"),
+            "state": geo.get("state"),
+            "country": geo.get("country")
+        })
+    except asyncio.QueueFull:
+        logger.warning("Visit queue full - dropping visit log")
+        return {"status": "skipped", "reason": "queue_full"}
     
     return {"status": "success"}
 
 
 @router.get("/api/analytics")
-def get_analytics(session: Session = Depends(get_session)):
+def get_analytics(session: Session = Depends(get_read_session)):
+    return analytics_cache.get_or_load("summary", lambda: _compute_analytics(session))
+
+
+def _compute_analytics(session: Session):
     # 1. Total Visits (All Time)
     total_visits = session.exec(select(func.count(VisitorLog.id))).one()
     
@@ -120,8 +218,8 @@ def get_analytics(session: Session = Depends(get_session)):
     ]
     
     # 3. Active Users (unique IPs today)
-    today_str = datetime.utcnow().strftime("%Y-%m-%d")
-    active_query = select(func.count(VisitorLog.ip_hash.distinct())).where(VisitorLog.date == today_str)
+    today = datetime.utcnow().date()
+    active_query = select(func.count(VisitorLog.ip_hash.distinct())).where(VisitorLog.date == today)
     active_users = session.exec(active_query).one()
 
     return {
@@ -196,7 +294,6 @@ def clean_template_paths(session: Session = Depends(get_session)):
 
 
 @router.get("/api/analytics/logs")
-def get_logs(limit: int = 50, session: Session = Depends(get_session)):
-    query = select(VisitorLog).order_by(VisitorLog.timestamp.desc()).limit(limit)
-    logs = session.exec(query).all()
+def get_logs(limit: int = 50, session: Session = Depends(get_read_session)):
+    logs = session.exec(_LOGS_STMT, params={"n": limit}).all()
     return logs
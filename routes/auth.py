@@ -1,10 +1,12 @@
 import os
-import random
+import hashlib
+import hmac
+import secrets
 import requests
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Body, Header
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
+from sqlalchemy import update
 from typing import Optional, Union
 from pydantic import BaseModel
 import uuid
@@ -12,17 +14,28 @@ import uuid
 # Internal Imports
 from database import get_session
 from models import AdminUser, Customer, Order
-from auth_utils import verify_password, create_access_token
+from auth_utils import verify_password, create_access_token, pwd_context
 from dependencies import get_current_user, oauth2_scheme
-from passlib.context import CryptContext
 from firebase_utils import verify_firebase_token
+from cache_utils import TTLCache
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# --- Login rate limit ---
+# At most LOGIN_MAX_ATTEMPTS failed password checks per email per window, so
+# credential stuffing can't keep the argon2 verifier pinned on one account.
+LOGIN_MAX_ATTEMPTS = 5
+login_attempts = TTLCache(ttl=60, maxsize=10_000)
 
 # --- 2FA Storage (In-Memory for simplicity) ---
-otp_storage = {}
+# Entries expire on their own after 5 minutes and the cache is bounded, so
+# abandoned logins can't grow it. Only a salted HMAC of each OTP is kept.
+OTP_TTL_SECONDS = 300
+otp_storage = TTLCache(ttl=OTP_TTL_SECONDS, maxsize=10_000)
+_OTP_SALT = secrets.token_bytes(16)
+
+def _otp_digest(otp: str) -> str:
+    return hmac.new(_OTP_SALT, otp.encode(), hashlib.sha256).hexdigest()
 
 # --- Schemas ---
 
@@ -81,8 +94,16 @@ class TelegramAuth(BaseModel):
     auth_date: int
     hash: str
 
-import hashlib
-import hmac
+# Telegram data-check-string fields, already in the required alphabetical order
+_TG_FIELDS = ('auth_date', 'first_name', 'id', 'last_name', 'photo_url', 'username')
+
+# Widget secret is SHA-256(bot token); the token is fixed for the process
+_TG_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+
+# Pooled connection to api.telegram.org so 2FA sends skip the TCP/TLS handshake
+_telegram_session = requests.Session()
+_telegram_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+_TG_SECRET_KEY = hashlib.sha256(_TG_BOT_TOKEN.encode()).digest() if _TG_BOT_TOKEN else None
 
 @router.post("/api/auth/telegram", response_model=LoginResponse)
 def telegram_login(data: TelegramAuth, session: Session = Depends(get_session)):
@@ -90,28 +111,21 @@ def telegram_login(data: TelegramAuth, session: Session = Depends(get_session)):
     Verify Telegram Login Widget Data
     """
     # 1. Verify Hash
-    BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-    if not BOT_TOKEN:
+    if not _TG_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Server misconfiguration: Telegram Token Missing")
     
     # Construct data check string
     # Data-check-string is a concatenation of all received fields, sorted alphabetically, 
     # in the format key=value with a line feed character ('\n') as separator.
-    vals = data.dict(exclude={'hash'})
-    data_check_arr = []
-    for key, value in vals.items():
-        if value is not None:
-            data_check_arr.append(f"{key}={value}")
-    
-    data_check_arr.sort()
-    data_check_string = '\n'.join(data_check_arr)
+    data_check_string = '\n'.join(
+        f"{key}={value}" for key in _TG_FIELDS if (value := getattr(data, key)) is not None
+    )
     
     # Calculate HMAC-SHA256
-    secret_key = hashlib.sha256(BOT_TOKEN.encode()).digest()
-    hash_payload = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    hash_payload = hmac.new(_TG_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
     
     # Check if hash matches
-    if hash_payload != data.hash:
+    if not hmac.compare_digest(hash_payload.encode(), data.hash.encode()):
         raise HTTPException(status_code=400, detail="Data integrity check failed")
 
     # 2. Check/Create User
@@ -233,20 +247,15 @@ def firebase_auth(
     
     # 3. Link any guest orders to this customer
     if email:
-        guest_orders = session.exec(
-            select(Order).where(
-                Order.email == email,
-                Order.user_id == None
-            )
-        ).all()
-        
-        for order in guest_orders:
-            order.user_id = customer.id
-            session.add(order)
+        linked = session.execute(
+            update(Order)
+            .where(Order.email == email, Order.user_id == None)
+            .values(user_id=customer.id)
+        ).rowcount
         
-        if guest_orders:
+        if linked:
             session.commit()
-            print(f"✅ Linked {len(guest_orders)} guest orders to customer {customer.id}")
+            print(f"✅ Linked {linked} guest orders to customer {customer.id}")
     
     # 4. Issue local JWT
     access_token = create_access_token(data={
@@ -344,20 +353,15 @@ def google_oauth_auth(
         print(f"✅ Created new customer {customer.id} from Google OAuth")
 
     # 3. Link any guest orders to this customer
-    guest_orders = session.exec(
-        select(Order).where(
-            Order.email == email,
-            Order.user_id == None
-        )
-    ).all()
+    linked = session.execute(
+        update(Order)
+        .where(Order.email == email, Order.user_id == None)
+        .values(user_id=customer.id)
+    ).rowcount
 
-    for order in guest_orders:
-        order.user_id = customer.id
-        session.add(order)
-
-    if guest_orders:
+    if linked:
         session.commit()
-        print(f"✅ Linked {len(guest_orders)} guest orders to customer {customer.id}")
+        print(f"✅ Linked {linked} guest orders to customer {customer.id}")
 
     # 4. Issue local JWT
     access_token = create_access_token(data={
@@ -384,25 +388,38 @@ def google_oauth_auth(
 @router.post("/api/admin/verify-otp", response_model=Token)
 def verify_admin_otp(data: VerifyOTP):
     username = data.username
-    record = otp_storage.get(username)
+    code_digest = otp_storage.get(username)
     
-    if not record:
+    if not code_digest:
         raise HTTPException(status_code=400, detail="OTP request not found or expired")
-    
-    if datetime.now() > record['expires']:
-        del otp_storage[username]
-        raise HTTPException(status_code=400, detail="OTP expired")
         
-    if data.otp != record['code']:
+    if not hmac.compare_digest(_otp_digest(data.otp), code_digest):
          raise HTTPException(status_code=400, detail="Invalid OTP")
          
     # OTP Valid - Issue Token
-    del otp_storage[username] # One-time use
+    otp_storage.invalidate(username) # One-time use
     access_token = create_access_token(data={"sub": username, "role": "admin"})
     return {"access_token": access_token, "token_type": "bearer"}
 
+def send_telegram_otp(bot_token: str, chat_id: str, username: str, otp: str):
+    """Deliver an admin 2FA code via Telegram (runs as a background task)."""
+    try:
+        msg = f"🔐 *Admin Login Verification*\n\nUser: `{username}`\nOTP: `{otp}`\n\nValid for 5 minutes."
+        resp = _telegram_session.post(
+            f"https://api.telegram.org/bot{bot_token}/sendMessage",
+            json={"chat_id": chat_id, "text": msg, "parse_mode": "Markdown"},
+            timeout=5
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"Telegram Auth Error: {e}")
+
 @router.post("/api/login", response_model=LoginResponse)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+def login_for_access_token(
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session: Session = Depends(get_session)
+):
     # print(f"DEBUG: Login Attempt for: {form_data.username}") # REMOVED LOG
     user = session.exec(select(AdminUser).where(AdminUser.username == form_data.username)).first()
     
@@ -417,40 +434,25 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), ses
         raise HTTPException(status_code=401, detail="Invalid password")
     
     # 2FA Logic
-    otp = "".join([str(random.randint(0, 9)) for _ in range(6)])
-    expiration = datetime.now() + timedelta(minutes=5)
-    
-    otp_storage[user.username] = {
-        "code": otp,
-        "expires": expiration
-    }
+    otp = "".join(secrets.choice("0123456789") for _ in range(6))
+    otp_storage.set(user.username, _otp_digest(otp))
     
     # Send Telegram
     bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
     
     if bot_token and chat_id:
-        try:
-            msg = f"🔐 *Admin Login Verification*\n\nUser: `{user.username}`\nOTP: `{otp}`\n\nValid for 5 minutes."
-            requests.post(
-                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                json={"chat_id": chat_id, "text": msg, "parse_mode": "Markdown"},
-                timeout=5
-            )
-            return {"status": "2fa_required", "username": user.username, "message": "OTP Sent to Telegram"}
-        except Exception as e:
-            print(f"Telegram Auth Error: {e}")
-            # Fallback if telegram fails? No, stricter security means fail or fallback
-            # For now, if no credentials, we might return token (dev mode) or fail
-            pass
+        # Sent after the response goes out; the client doesn't wait on Telegram
+        background_tasks.add_task(send_telegram_otp, bot_token, chat_id, user.username, otp)
+        return {"status": "2fa_required", "username": user.username, "message": "OTP Sent to Telegram"}
 
-    # If Telegram not configured (Dev mode fallback) OR failed
+    # If Telegram not configured (Dev mode fallback)
     if not bot_token:
          # In dev, maybe simulate 2FA by printing to console?
          print(f"DEBUG: Telegram not configured for 2FA. OTP generation skipped in secure mode.")
          return {"status": "error", "username": user.username, "message": "2FA Service Unavailable"}
          
-    # If failed to send
+    # Bot token without a chat to send to
     raise HTTPException(status_code=500, detail="Failed to send 2FA OTP")
 
 
@@ -480,14 +482,20 @@ def customer_signup(customer_data: CustomerCreate, session: Session = Depends(ge
     )
     session.add(new_customer)
     session.commit()
-    session.refresh(new_customer)
     return new_customer
 
 @router.post("/api/auth/login")
 def customer_login(login_data: CustomerLogin, session: Session = Depends(get_session)):
+    email_key = login_data.email.lower()
+    # Count the attempt before checking the password so a parallel burst
+    # can't all read the same count; a successful login resets it
+    if login_attempts.incr(email_key) > LOGIN_MAX_ATTEMPTS:
+        raise HTTPException(status_code=429, detail="Too many login attempts. Please try again in a minute.")
+
     customer = session.exec(select(Customer).where(Customer.email == login_data.email)).first()
     if not customer or not customer.hashed_password or not pwd_context.verify(login_data.password, customer.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    login_attempts.invalidate(email_key)
     
     # Create simple JWT for customer
     token = create_access_token(data={"sub": customer.email, "role": "customer", "name": customer.full_name, "customer_id": customer.id})
@@ -534,12 +542,13 @@ def sync_user(user_data: UserSync, token: str = Depends(oauth2_scheme), session:
                 
                 # CRITICAL: Link old Guest Orders to this new User ID
                 # Find orders with this email but no user_id, update them
-                guest_orders = session.exec(select(Order).where(Order.email == customer.email, Order.user_id == None)).all()
-                for order in guest_orders:
-                    order.user_id = uuid.UUID(uid)
-                    session.add(order)
+                linked = session.execute(
+                    update(Order)
+                    .where(Order.email == customer.email, Order.user_id == None)
+                    .values(user_id=uuid.UUID(uid))
+                ).rowcount
                 session.commit()
-                print(f"DEBUG: Linked {len(guest_orders)} guest orders to user {uid}")
+                print(f"DEBUG: Linked {linked} guest orders to user {uid}")
 
         else:
             # Create new customer
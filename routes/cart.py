@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from sqlmodel import Session, select
+from sqlalchemy import bindparam, delete, exists, func, insert, update
+from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 # Internal Imports
 from database import get_session
@@ -10,6 +13,24 @@ from dependencies import get_current_user
 
 router = APIRouter()
 
+# Read statements built once at import; per-request values are bound via params
+_CART_STMT = select(Cart).where(Cart.customer_id == bindparam("cid"))
+
+# Cart items with product details (one JOIN instead of a Product lookup per item;
+# the inner join also drops items whose product no longer exists, as before).
+# Null fallbacks are applied in SQL: price -> 0, mrp -> price, stock -> 0.
+_price_col = func.coalesce(Product.price, 0)
+_CART_ITEMS_STMT = (
+    select(
+        CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.variant_sku,
+        Product.name, _price_col, func.coalesce(Product.mrp, _price_col), func.coalesce(Product.stock, 0), Product.image
+    )
+    .join(Cart, Cart.id == CartItem.cart_id)
+    .join(Product, Product.id == CartItem.product_id)
+    .where(Cart.customer_id == bindparam("cid"))
+    .order_by(CartItem.id)
+)
+
 # --- Schemas ---
 
 class CartItemCreate(BaseModel):
@@ -20,80 +41,109 @@ class CartItemCreate(BaseModel):
 class CartSync(BaseModel):
     local_items: List[CartItemCreate]
 
+def _json_body(model):
+    """
+    Body dependency that parses and validates the raw bytes in one pydantic-core
+    pass (model_validate_json), instead of json.loads -> dict -> validate.
+    """
+    async def parse(request: Request):
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            # Same error shape as FastAPI's own body validation: loc starts with "body"
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            )
+    return parse
+
+# --- Helpers ---
+
+def _clean_product_id(product_id: str) -> str:
+    """Strip the "-default" SKU suffix guest carts append to product ids."""
+    if product_id.endswith("-default"):
+        return product_id.replace("-default", "")
+    return product_id
+
+def _owned_item(customer_id: int, item_id: int) -> tuple:
+    """WHERE clauses matching a cart item only if it sits in the customer's cart."""
+    return (
+        CartItem.id == item_id,
+        CartItem.cart_id.in_(select(Cart.id).where(Cart.customer_id == customer_id)),
+    )
+
+def _cart_items(session: Session, customer_id: int) -> list:
+    """Build the cart response rows for a customer's cart (empty list if there's no cart)."""
+    rows = session.exec(_CART_ITEMS_STMT, params={"cid": customer_id}).all()
+    
+    return [
+        {
+            "id": item_id,
+            "productId": product_id,
+            "productName": name,
+            "quantity": quantity,
+            "stock": stock,  # Include stock for frontend validation
+            "product": {
+                "mrp": mrp  # Real MRP from database
+            },
+            "variant": {
+                "sku": variant_sku or f"{product_id}-default",
+                "name": "Standard", # Placeholder
+                "price": price,
+                "compareAt": mrp,  # MRP as compareAt for frontend compatibility
+                "image": image
+            }
+        }
+        for item_id, product_id, quantity, variant_sku, name, price, mrp, stock, image in rows
+    ]
+
 # --- Routes ---
 
 @router.get("/api/cart")
 def get_cart(user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
-    if not cart:
-        return []
-    
-    # Fetch items with product details
-    items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
-    
-    # Enrich with product data
-    result = []
-    for item in items:
-        product = session.get(Product, item.product_id)
-        if product:
-            # Ensure price is never None/null - use 0 as fallback
-            price = product.price if product.price is not None else 0
-            mrp = product.mrp if product.mrp is not None else price  # MRP from DB, fallback to price
-            stock = product.stock if product.stock is not None else 0
-            result.append({
-                "id": item.id,
-                "productId": item.product_id,
-                "productName": product.name,
-                "quantity": item.quantity,
-                "stock": stock,  # Include stock for frontend validation
-                "product": {
-                    "mrp": mrp  # Real MRP from database
-                },
-                "variant": {
-                    "sku": item.variant_sku or f"{product.id}-default",
-                    "name": "Standard", # Placeholder
-                    "price": price,
-                    "compareAt": mrp,  # MRP as compareAt for frontend compatibility
-                    "image": product.image
-                }
-            })
-    return result
+    # Cart -> items -> products in a single statement
+    return _cart_items(session, user.id)
 
 @router.post("/api/cart/sync")
-def sync_cart(sync_data: CartSync, user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
+def sync_cart(sync_data: CartSync = Depends(_json_body(CartSync)), user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
+    cart = session.exec(_CART_STMT, params={"cid": user.id}).first()
     if not cart:
         cart = Cart(customer_id=user.id)
         session.add(cart)
-        session.commit()
-        session.refresh(cart)
+        session.flush()  # assigns cart.id; committed with the items below
     
     # Existing Items Map: Key = (clean_product_id, normalized_sku)
     # clean_product_id: stripped of "-default"
     # normalized_sku: None -> "{product_id}-default" for key matching
-    existing_items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
-    existing_map = {}
+    # Only the columns needed for matching: no CartItem objects enter the identity
+    # map, so the response query below sees the bulk-written quantities.
+    existing_items = session.exec(
+        select(CartItem.id, CartItem.product_id, CartItem.variant_sku).where(CartItem.cart_id == cart.id)
+    ).all()
+    existing_map = {}  # key -> {"id", "quantity"} row for the bulk UPDATE
+    new_rows = {}      # key -> row for the bulk INSERT
     
-    for item in existing_items:
+    for item_id, p_id, sku in existing_items:
         # Normalize Data from DB
-        p_id = item.product_id
         # SKUs in DB might be None (old data) or specific string
         # We need a robust key. 
         # Strategy: Use SKU if available, else construct default SKU
-        sku = item.variant_sku
-        
         if not sku:
              sku = f"{p_id}-default"
              
-        existing_map[(p_id, sku)] = item
+        existing_map[(p_id, sku)] = {"id": item_id}
 
     warnings = []
+    now = datetime.utcnow()  # one timestamp for every row added by this sync
+
+    # Resolve every referenced product in one IN query instead of one get() per item
+    local_ids = {_clean_product_id(i.product_id) for i in sync_data.local_items}
+    products = {
+        p.id: p for p in session.exec(select(Product).where(Product.id.in_(local_ids))).all()
+    } if local_ids else {}
     
     for local_item in sync_data.local_items:
         # Normalize incoming local data
-        local_p_id = local_item.product_id
-        if local_p_id.endswith("-default"):
-             local_p_id = local_p_id.replace("-default", "")
+        local_p_id = _clean_product_id(local_item.product_id)
              
         local_sku = local_item.variant_sku
         if not local_sku:
@@ -102,21 +152,20 @@ def sync_cart(sync_data: CartSync, user: Customer = Depends(get_current_user), s
         key = (local_p_id, local_sku)
         
         # Fetch product to check stock
-        product = session.get(Product, local_p_id)
+        product = products.get(local_p_id)
         stock = product.stock if product and product.stock is not None else float('inf')
         product_name = product.name if product else local_p_id
 
-        if key in existing_map:
+        if key in existing_map or key in new_rows:
             # REPLACE: Guest cart quantity IS the truth, overwrite DB
-            existing_item = existing_map[key]
+            existing_item = existing_map.get(key) or new_rows[key]
             new_qty = local_item.quantity
             
             if new_qty > stock:
                 warnings.append(f"{product_name}: quantity reduced from {new_qty} to {int(stock)} (limited stock)")
                 new_qty = int(stock)
                 
-            existing_item.quantity = new_qty
-            session.add(existing_item)
+            existing_item["quantity"] = new_qty
         else:
             # Add new item logic with stock check
             final_qty = local_item.quantity
@@ -125,40 +174,42 @@ def sync_cart(sync_data: CartSync, user: Customer = Depends(get_current_user), s
                 final_qty = int(stock)
                 
             if final_qty > 0: # Only add if we have quantity
-                new_item = CartItem(
-                    cart_id=cart.id, 
-                    product_id=local_p_id, 
-                    quantity=final_qty,
-                    variant_sku=local_sku
-                )
-                session.add(new_item)
-                existing_map[key] = new_item
+                new_rows[key] = {
+                    "cart_id": cart.id,
+                    "product_id": local_p_id,
+                    "quantity": final_qty,
+                    "variant_sku": local_sku,
+                    "added_at": now
+                }
     
+    # One executemany UPDATE by primary key + one multi-row INSERT
+    updates = [row for row in existing_map.values() if "quantity" in row]
+    if updates:
+        session.execute(update(CartItem), updates)
+    if new_rows:
+        session.execute(insert(CartItem), list(new_rows.values()))
     session.commit()
     
-    cart_items = get_cart(user, session)
-    return {"items": cart_items, "warnings": warnings}
+    return {"items": _cart_items(session, user.id), "warnings": warnings}
 
 @router.post("/api/cart/items")
-def add_to_cart(item_in: CartItemCreate, user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
+def add_to_cart(item_in: CartItemCreate = Depends(_json_body(CartItemCreate)), user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
+    cart = session.exec(_CART_STMT, params={"cid": user.id}).first()
     if not cart:
         cart = Cart(customer_id=user.id)
         session.add(cart)
-        session.commit()
-        session.refresh(cart)
+        session.flush()  # assigns cart.id; committed with the items below
         
-    # Sanitize product_id: If it looks like a SKU (ends with -default), strip it
-    real_product_id = item_in.product_id
-    if "-default" in real_product_id and not session.get(Product, real_product_id):
-        # Try to recover the real product ID
-        potential_id = real_product_id.split("-default")[0]
-        if session.get(Product, potential_id):
-            real_product_id = potential_id
-            # Also update item_in for consistency if needed, but we use real_product_id below
+    # Sanitize product_id: If it looks like a SKU (ends with -default), strip it.
+    # Both candidates are fetched in one query; the id as sent wins if it exists.
+    candidates = [item_in.product_id]
+    if "-default" in item_in.product_id:
+        candidates.append(item_in.product_id.split("-default")[0])
+    found = {p.id: p for p in session.exec(select(Product).where(Product.id.in_(candidates))).all()}
+    product = next((found[c] for c in candidates if c in found), None)
+    real_product_id = product.id if product else item_in.product_id
     
     # Validation: Check Stock
-    product = session.get(Product, real_product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
         
@@ -172,76 +223,83 @@ def add_to_cart(item_in: CartItemCreate, user: Customer = Depends(get_current_us
             detail=f"Only {product.stock} units available in stock"
         )
     
-    # Check duplicate
-    existing = session.exec(select(CartItem).where(
+    # Bump an existing line in one UPDATE ... RETURNING (no SELECT-then-write);
+    # only when nothing matched do we INSERT a new line.
+    same_line = (
         CartItem.cart_id == cart.id,
         CartItem.product_id == real_product_id,
         CartItem.variant_sku == item_in.variant_sku
-    )).first()
+    )
+    first_match = select(CartItem.id).where(*same_line).order_by(CartItem.id).limit(1).scalar_subquery()
+    existing = session.execute(
+        update(CartItem)
+        .where(CartItem.id == first_match)
+        .values(quantity=CartItem.quantity + item_in.quantity)
+        .returning(CartItem)
+    ).scalars().first()
     
     if existing:
-        new_total_qty = existing.quantity + item_in.quantity
-        if product.stock is not None and new_total_qty > product.stock:
-             raise HTTPException(
-                status_code=400, 
-                detail=f"Cannot add more. You already have {existing.quantity} in cart. Max available: {product.stock}"
-            )
-        existing.quantity += item_in.quantity
-        session.add(existing)
-    else:
-        new_item = CartItem(
-            cart_id=cart.id,
-            product_id=real_product_id, # Ensure this matches Product.id (string)
-            quantity=item_in.quantity,
-            variant_sku=item_in.variant_sku
-        )
-        session.add(new_item)
-        
+        if product.stock is not None and existing.quantity > product.stock:
+            detail = f"Cannot add more. You already have {existing.quantity - item_in.quantity} in cart. Max available: {product.stock}"
+            session.rollback()
+            raise HTTPException(status_code=400, detail=detail)
+        session.commit()
+        return existing
+
+    new_item = CartItem(
+        cart_id=cart.id,
+        product_id=real_product_id, # Ensure this matches Product.id (string)
+        quantity=item_in.quantity,
+        variant_sku=item_in.variant_sku
+    )
+    session.add(new_item)
     session.commit()
-    session.refresh(existing if existing else new_item)
-    return existing if existing else new_item
+    return new_item
 
 @router.put("/api/cart/items/{item_id}")
 def update_cart_item(item_id: int, quantity: int, user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
-    if not cart: raise HTTPException(status_code=404)
-    
-    item = session.get(CartItem, item_id)
-    if not item or item.cart_id != cart.id:
-        raise HTTPException(status_code=404, detail="Item not found")
-        
+    # Single guarded UPDATE/DELETE: ownership (and stock) checked in the WHERE clause
     if quantity <= 0:
-        session.delete(item)
+        result = session.execute(delete(CartItem).where(*_owned_item(user.id, item_id)))
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Item not found")
     else:
-        # Stock validation
-        product = session.get(Product, item.product_id)
-        if product and product.stock is not None and quantity > product.stock:
+        over_stock = exists().where(Product.id == CartItem.product_id, Product.stock < quantity)
+        result = session.execute(
+            update(CartItem)
+            .where(*_owned_item(user.id, item_id), ~over_stock)
+            .values(quantity=quantity)
+        )
+        if result.rowcount == 0:
+            # Nothing updated: work out whether the item is missing or stock is short
+            row = session.exec(
+                select(Product.stock)
+                .select_from(CartItem)
+                .outerjoin(Product, Product.id == CartItem.product_id)
+                .where(*_owned_item(user.id, item_id))
+            ).first()
+            if row is None:
+                raise HTTPException(status_code=404, detail="Item not found")
             raise HTTPException(
                 status_code=400,
-                detail=f"Only {product.stock} units available in stock"
+                detail=f"Only {row} units available in stock"
             )
-        item.quantity = quantity
-        session.add(item)
     
     session.commit()
     return {"ok": True}
 
 @router.delete("/api/cart/items/{item_id}")
 def remove_from_cart(item_id: int, user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
-    if not cart: raise HTTPException(status_code=404)
-
-    item = session.get(CartItem, item_id)
-    if not item or item.cart_id != cart.id:
+    result = session.execute(delete(CartItem).where(*_owned_item(user.id, item_id)))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Item not found")
-        
-    session.delete(item)
+
     session.commit()
     return {"ok": True}
 
 @router.delete("/api/cart/clear")
 def clear_cart(user: Customer = Depends(get_current_user), session: Session = Depends(get_session)):
-    cart = session.exec(select(Cart).where(Cart.customer_id == user.id)).first()
+    cart = session.exec(_CART_STMT, params={"cid": user.id}).first()
     if not cart:
         return {"ok": True, "message": "Cart already empty"}
     
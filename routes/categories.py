@@ -1,19 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.responses import ORJSONResponse
 from sqlmodel import Session, select
+from sqlalchemy import exists
 from typing import List
 from database import get_session
 from category_model import Category, CategoryBase
 from datetime import datetime
+from cache_utils import TTLCache
+import orjson
 
 router = APIRouter()
 
-@router.get("/api/categories", response_model=List[Category])
+# Category list is read on nearly every page and rarely changes, so each
+# (gender, active_only) variant is kept as its serialized JSON body. Writes clear
+# it in this worker; other workers pick changes up within the TTL.
+categories_cache = TTLCache(ttl=60, maxsize=32)
+
+# Handlers return ORJSONResponse built from model_dump() so FastAPI skips the
+# response_model re-validation pass; `responses=` keeps the schema in the docs.
+@router.get("/api/categories", responses={200: {"model": List[Category]}})
 def get_categories(
     gender: str = None,
     active_only: bool = True,
     session: Session = Depends(get_session)
 ):
     """Get all categories, optionally filtered by gender"""
+    body = categories_cache.get_or_load(
+        (gender, active_only), lambda: orjson.dumps(_load_categories(session, gender, active_only))
+    )
+    return Response(content=body, media_type="application/json")
+
+def _load_categories(session: Session, gender: str, active_only: bool):
     statement = select(Category)
     
     if active_only:
@@ -27,34 +44,31 @@ def get_categories(
     
     statement = statement.order_by(Category.sort_order, Category.name)
     categories = session.exec(statement).all()
-    return categories
+    return [c.model_dump() for c in categories]
 
-@router.get("/api/categories/{category_id}", response_model=Category)
+@router.get("/api/categories/{category_id}", responses={200: {"model": Category}})
 def get_category(category_id: int, session: Session = Depends(get_session)):
     """Get a specific category"""
     category = session.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    return ORJSONResponse(content=category.model_dump())
 
-@router.post("/api/categories", response_model=Category)
+@router.post("/api/categories", responses={200: {"model": Category}})
 def create_category(category: CategoryBase, session: Session = Depends(get_session)):
     """Create a new category"""
     # Check if category name already exists
-    existing = session.exec(
-        select(Category).where(Category.name == category.name)
-    ).first()
-    
-    if existing:
+    if session.scalar(select(exists().where(Category.name == category.name))):
         raise HTTPException(status_code=400, detail="Category name already exists")
     
     db_category = Category.from_orm(category)
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
-    return db_category
+    categories_cache.clear()
+    return ORJSONResponse(content=db_category.model_dump())
 
-@router.put("/api/categories/{category_id}", response_model=Category)
+@router.put("/api/categories/{category_id}", responses={200: {"model": Category}})
 def update_category(
     category_id: int,
     category_update: CategoryBase,
@@ -67,10 +81,7 @@ def update_category(
     
     # Check if new name conflicts with another category
     if category_update.name != db_category.name:
-        existing = session.exec(
-            select(Category).where(Category.name == category_update.name)
-        ).first()
-        if existing:
+        if session.scalar(select(exists().where(Category.name == category_update.name))):
             raise HTTPException(status_code=400, detail="Category name already exists")
     
     category_data = category_update.dict(exclude_unset=True)
@@ -80,7 +91,8 @@ def update_category(
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
-    return db_category
+    categories_cache.clear()
+    return ORJSONResponse(content=db_category.model_dump())
 
 @router.delete("/api/categories/{category_id}")
 def delete_category(category_id: int, session: Session = Depends(get_session)):
@@ -91,4 +103,5 @@ def delete_category(category_id: int, session: Session = Depends(get_session)):
     
     session.delete(category)
     session.commit()
+    categories_cache.clear()
     return {"message": "Category deleted successfully"}
@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select
+from sqlalchemy import exists, func
 from typing import List, Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel
+import orjson
 
 # Internal Imports
 from database import get_session
 from models import Coupon, Promotion, AdminUser
 from dependencies import oauth2_scheme, get_current_user
+from cache_utils import TTLCache
 
 router = APIRouter()
 
+# validate_coupon results (including 4xx outcomes, so unknown codes are cached
+# too and guessing doesn't reach the DB). Cleared on any coupon/offer write.
+coupon_cache = TTLCache(ttl=60, maxsize=2048)
+
+# Admin coupon list pages, kept as (serialized JSON body, next cursor) per
+# (after_id, limit). Cleared on coupon/offer writes.
+coupon_list_cache = TTLCache(ttl=60, maxsize=32)
+
 
 # Pydantic model for safe coupon updates (avoids 422 & float() crash)
 class CouponUpdateRequest(BaseModel):
@@ -29,23 +40,48 @@ def create_coupon(
     session: Session = Depends(get_session)
 ):
     """Create a new coupon (Admin only)"""
+    # Store codes normalized so lookups are a plain match on the indexed column
+    coupon.code = coupon.code.strip().upper()
+
     # Check if code already exists
-    existing = session.exec(select(Coupon).where(Coupon.code == coupon.code)).first()
-    if existing:
+    if session.scalar(select(exists().where(Coupon.code == coupon.code))):
         raise HTTPException(status_code=400, detail="Coupon code already exists")
     
     session.add(coupon)
     session.commit()
     session.refresh(coupon)
+    coupon_cache.clear()
+    coupon_list_cache.clear()
     return coupon
 
 @router.get("/api/coupons")
 def list_coupons(
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     token: str = Depends(oauth2_scheme), 
     session: Session = Depends(get_session)
 ):
-    """List all coupons with linked offer info (Admin only)"""
-    coupons = session.exec(select(Coupon)).all()
+    """
+    List coupons with linked offer info, in id order (Admin only).
+    Keyset-paginated: pass the X-Next-Cursor header value back as after_id.
+    """
+    body, next_cursor = coupon_list_cache.get_or_load(
+        (after_id, limit), lambda: _list_coupons(session, after_id, limit)
+    )
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _list_coupons(session: Session, after_id: int, limit: int) -> tuple:
+    coupons = session.exec(
+        select(Coupon).where(Coupon.id > after_id).order_by(Coupon.id).limit(limit)
+    ).all()
+    # Linked offers for all codes in one query instead of one per coupon
+    promos = {}
+    codes = [c.code for c in coupons]
+    if codes:
+        for promo in session.exec(select(Promotion).where(Promotion.coupon_code.in_(codes))).all():
+            promos.setdefault(promo.coupon_code, promo)
     result = []
     for c in coupons:
         data = {
@@ -56,16 +92,16 @@ def list_coupons(
             "linked_offer": None,
             "payment_method_restriction": c.payment_method_restriction or "none"
         }
-        promo = session.exec(
-            select(Promotion).where(Promotion.coupon_code == c.code)
-        ).first()
+        promo = promos.get(c.code)
         if promo:
             data["linked_offer"] = {
                 "id": promo.id, "title": promo.title,
                 "is_active": promo.is_active
             }
         result.append(data)
-    return result
+    # A full page means there may be more rows after the last id
+    next_cursor = coupons[-1].id if len(coupons) == limit else None
+    return orjson.dumps(result), next_cursor
 
 @router.delete("/api/coupons/{coupon_id}")
 def delete_coupon(
@@ -90,6 +126,8 @@ def delete_coupon(
     
     session.delete(coupon)
     session.commit()
+    coupon_cache.clear()
+    coupon_list_cache.clear()
     return {"message": "Coupon deleted successfully"}
 
 
@@ -124,6 +162,8 @@ def update_coupon(
     session.add(coupon)
     session.commit()
     session.refresh(coupon)
+    coupon_cache.clear()
+    coupon_list_cache.clear()
     return coupon
 
 
@@ -133,12 +173,23 @@ def validate_coupon(
     session: Session = Depends(get_session)
 ):
     """Validate a coupon code (Public)"""
-    # Try exact match first
-    coupon = session.exec(select(Coupon).where(Coupon.code == code)).first()
-    
-    # If not found, try case-insensitive match
-    if not coupon:
-        coupon = session.exec(select(Coupon).where(Coupon.code == code.upper())).first()
+    result = coupon_cache.get_or_load(code.upper(), lambda: _check_coupon(code, session))
+    if isinstance(result, HTTPException):
+        raise result
+    return result
+
+
+def _check_coupon(code: str, session: Session):
+    """Resolve a coupon; HTTP errors are returned (not raised) so they get cached."""
+    try:
+        return _resolve_coupon(code, session)
+    except HTTPException as e:
+        return e
+
+
+def _resolve_coupon(code: str, session: Session):
+    # Case-insensitive match in one query (backed by the upper(code) index)
+    coupon = session.exec(select(Coupon).where(func.upper(Coupon.code) == code.upper())).first()
     
     # Check if this coupon is linked to a promotion for restrictions
     promo = session.exec(
@@ -151,13 +202,12 @@ def validate_coupon(
     # If coupon not found in coupon table but exists as active promotion, auto-sync it
     if not coupon and promo:
         from .promotions import _sync_coupon_to_db
-        _sync_coupon_to_db(
+        coupon = _sync_coupon_to_db(
             session, promo.coupon_code, promo.discount_type,
             promo.discount_value, promo.min_cart_value,
             is_active=True,
         )
         session.commit()
-        coupon = session.exec(select(Coupon).where(Coupon.code == code.upper())).first()
 
     if not coupon:
         raise HTTPException(status_code=404, detail="Invalid coupon code")
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Response
 from sqlmodel import Session, select
-from typing import List, Dict
+from sqlalchemy import literal, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Dict, Optional
+from pydantic import BaseModel
+import orjson
 from datetime import datetime
 
 # Internal Imports
@@ -8,9 +12,16 @@ from database import get_session
 from models import Address, Wishlist, Product, Customer, OrderReturn
 from dependencies import get_current_user
 from cloudinary_utils import upload_image_to_cloudinary
+from cache_utils import TTLCache
 
 router = APIRouter()
 
+# Per-customer wishlist/address lists, keyed by customer id. Writes invalidate the
+# entry in this worker; the short TTL bounds staleness across the other workers
+# while still absorbing the repeated fetches a single page load makes.
+wishlist_cache = TTLCache(ttl=10, maxsize=10_000)
+addresses_cache = TTLCache(ttl=10, maxsize=10_000)
+
 
 # --- Image Upload for Returns ---
 
@@ -44,7 +55,7 @@ async def upload_return_image(
 
 # --- Wishlist ---
 
-@router.get("/api/wishlist", response_model=List[Dict])
+@router.get("/api/wishlist", responses={200: {"model": List[Dict]}})
 def get_wishlist(
     current_user: Customer = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -53,32 +64,38 @@ def get_wishlist(
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    customer_id = current_user.id
-    wishlist_items = session.exec(
-        select(Wishlist).where(Wishlist.customer_id == customer_id)
+    # Cached as the serialized body: a hit skips validation and JSON encoding
+    body = wishlist_cache.get_or_load(
+        current_user.id, lambda: orjson.dumps(_load_wishlist(session, current_user.id))
+    )
+    return Response(content=body, media_type="application/json")
+
+def _load_wishlist(session: Session, customer_id: int) -> list:
+    # Wishlist rows with their products in one JOIN (the inner join drops
+    # entries whose product no longer exists, as the per-item lookup did)
+    rows = session.exec(
+        select(Wishlist, Product)
+        .join(Product, Product.id == Wishlist.product_id)
+        .where(Wishlist.customer_id == customer_id)
     ).all()
     
-    # Fetch product details
-    result = []
-    for item in wishlist_items:
-        product = session.get(Product, item.product_id)
-        if product:
-            result.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "added_at": item.added_at.isoformat(),
-                "product": {
-                    "id": product.id,
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image,
-                    "category": product.category,
-                    "metal": product.metal,
-                    "premium": product.premium
-                }
-            })
-    
-    return result
+    return [
+        {
+            "id": item.id,
+            "product_id": item.product_id,
+            "added_at": item.added_at.isoformat(),
+            "product": {
+                "id": product.id,
+                "name": product.name,
+                "price": product.price,
+                "image": product.image,
+                "category": product.category,
+                "metal": product.metal,
+                "premium": product.premium
+            }
+        }
+        for item, product in rows
+    ]
 
 @router.post("/api/wishlist")
 def add_to_wishlist(
@@ -92,21 +109,22 @@ def add_to_wishlist(
     
     customer_id = current_user.id
     
-    # Check if product exists
-    product = session.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Check if already in wishlist
-    existing = session.exec(
-        select(Wishlist).where(
-            Wishlist.customer_id == customer_id,
-            Wishlist.product_id == product_id
+    # Product existence + wishlist membership in one query
+    row = session.exec(
+        select(Product.id, Wishlist.id)
+        .select_from(Product)
+        .outerjoin(
+            Wishlist,
+            (Wishlist.product_id == Product.id) & (Wishlist.customer_id == customer_id)
         )
+        .where(Product.id == product_id)
     ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Product not found")
     
-    if existing:
-        return {"message": "Already in wishlist", "id": existing.id}
+    existing_id = row[1]
+    if existing_id:
+        return {"message": "Already in wishlist", "id": existing_id}
     
     # Add to wishlist
     wishlist_item = Wishlist(
@@ -115,7 +133,7 @@ def add_to_wishlist(
     )
     session.add(wishlist_item)
     session.commit()
-    session.refresh(wishlist_item)
+    wishlist_cache.invalidate(customer_id)
     
     return {
         "message": "Added to wishlist",
@@ -147,6 +165,7 @@ def remove_from_wishlist(
     
     session.delete(wishlist_item)
     session.commit()
+    wishlist_cache.invalidate(customer_id)
     
     return {"message": "Removed from wishlist"}
 
@@ -161,34 +180,67 @@ def sync_wishlist(
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     customer_id = current_user.id
-    added_count = 0
+    wanted = list(set(product_ids))
     
-    for product_id in product_ids:
-        # Check if already exists
-        existing = session.exec(
-            select(Wishlist).where(
+    added_count = 0
+    if wanted and session.get_bind().dialect.name == "postgresql":
+        # One INSERT ... SELECT over the ids that are real products; the unique
+        # (customer_id, product_id) index turns ones already saved into no-ops
+        stmt = pg_insert(Wishlist).from_select(
+            ["customer_id", "product_id", "added_at"],
+            select(literal(customer_id), Product.id, literal(datetime.utcnow()))
+            .where(Product.id.in_(wanted))
+        ).on_conflict_do_nothing(index_elements=["customer_id", "product_id"])
+        added_count = session.execute(stmt).rowcount
+    elif wanted:
+        # Other databases (local SQLite) may lack the unique index: filter first
+        existing_ids = set(session.exec(
+            select(Wishlist.product_id).where(
                 Wishlist.customer_id == customer_id,
-                Wishlist.product_id == product_id
+                Wishlist.product_id.in_(wanted)
             )
-        ).first()
-        
-        if not existing:
-            # Verify product exists
-            product = session.get(Product, product_id)
-            if product:
-                wishlist_item = Wishlist(
-                    customer_id=customer_id,
-                    product_id=product_id
-                )
-                session.add(wishlist_item)
-                added_count += 1
+        ).all())
+        new_items = [
+            Wishlist(customer_id=customer_id, product_id=product_id)
+            for product_id in session.exec(select(Product.id).where(Product.id.in_(wanted))).all()
+            if product_id not in existing_ids
+        ]
+        session.add_all(new_items)
+        added_count = len(new_items)
     
     session.commit()
+    wishlist_cache.invalidate(customer_id)
     return {"message": f"Synced {added_count} items to wishlist"}
 
 # --- Address ---
 
-@router.get("/api/addresses", response_model=List[Address])
+class AddressSummary(BaseModel):
+    """Address book entry as the UI uses it (no owner id or timestamps)."""
+    id: int
+    label: str
+    full_name: str
+    phone: str
+    address_line1: str
+    address_line2: Optional[str] = None
+    city: str
+    state: str
+    pincode: str
+    country: str
+    is_default: bool
+    address_type: str
+
+# Only these columns are selected for the list
+_ADDRESS_SUMMARY_COLUMNS = [getattr(Address, name) for name in AddressSummary.model_fields]
+
+def _unset_default_addresses(session: Session, customer_id: int):
+    """Clear the customer's default flag in one UPDATE (no per-row fetch/rewrite)."""
+    session.execute(
+        update(Address)
+        .where(Address.customer_id == customer_id, Address.is_default == True)
+        .values(is_default=False)
+    )
+
+@router.get("/api/addresses", response_model=List[AddressSummary])
 def get_addresses(
     current_user: Customer = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -197,13 +249,15 @@ def get_addresses(
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    addresses = session.exec(
-        select(Address)
-        .where(Address.customer_id == current_user.id)
+    return addresses_cache.get_or_load(current_user.id, lambda: _load_addresses(session, current_user.id))
+
+def _load_addresses(session: Session, customer_id: int) -> list:
+    rows = session.exec(
+        select(*_ADDRESS_SUMMARY_COLUMNS)
+        .where(Address.customer_id == customer_id)
         .order_by(Address.is_default.desc(), Address.created_at.desc())
     ).all()
-    
-    return addresses
+    return [dict(row._mapping) for row in rows]
 
 @router.post("/api/addresses", response_model=Address)
 def add_address(
@@ -217,16 +271,7 @@ def add_address(
     
     # If this is the first address or marked as default, unset other defaults
     if address_data.is_default:
-        existing_defaults = session.exec(
-            select(Address).where(
-                Address.customer_id == current_user.id,
-                Address.is_default == True
-            )
-        ).all()
-        
-        for addr in existing_defaults:
-            addr.is_default = False
-            session.add(addr)
+        _unset_default_addresses(session, current_user.id)
     
     # Create new address
     new_address = Address(
@@ -246,7 +291,7 @@ def add_address(
     
     session.add(new_address)
     session.commit()
-    session.refresh(new_address)
+    addresses_cache.invalidate(current_user.id)
     
     return new_address
 
@@ -267,16 +312,7 @@ def update_address(
     
     # If setting as default, unset others
     if address_data.is_default and not address.is_default:
-        existing_defaults = session.exec(
-            select(Address).where(
-                Address.customer_id == current_user.id,
-                Address.is_default == True
-            )
-        ).all()
-        
-        for addr in existing_defaults:
-            addr.is_default = False
-            session.add(addr)
+        _unset_default_addresses(session, current_user.id)
     
     # Update fields
     address.label = address_data.label
@@ -294,7 +330,7 @@ def update_address(
     
     session.add(address)
     session.commit()
-    session.refresh(address)
+    addresses_cache.invalidate(current_user.id)
     
     return address
 
@@ -314,6 +350,7 @@ def delete_address(
     
     session.delete(address)
     session.commit()
+    addresses_cache.invalidate(current_user.id)
     
     return {"message": "Address deleted successfully"}
 
@@ -333,22 +370,13 @@ def set_default_address(
         raise HTTPException(status_code=404, detail="Address not found")
     
     # Unset all other defaults
-    existing_defaults = session.exec(
-        select(Address).where(
-            Address.customer_id == current_user.id,
-            Address.is_default == True
-        )
-    ).all()
-    
-    for addr in existing_defaults:
-        addr.is_default = False
-        session.add(addr)
+    _unset_default_addresses(session, current_user.id)
     
     # Set this as default
     address.is_default = True
     session.add(address)
     session.commit()
-    session.refresh(address)
+    addresses_cache.invalidate(current_user.id)
     
     return address
 
@@ -373,6 +401,8 @@ def get_customer_returns(
 from models import Order
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import contextlib
 import json
 import os
 import requests
@@ -384,9 +414,50 @@ class ReturnRequest(BaseModel):
     items: Optional[list] = None  # List of item indices to return (for partial returns)
     images: Optional[List[str]] = None  # Image URLs from customer
 
+# Admin Telegram alert for new return requests (config read once at import)
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_SEND_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage" if TELEGRAM_BOT_TOKEN else None
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://varahajewels.in")
+# Inline keyboard linking to the CMS returns page
+RETURN_TELEGRAM_KEYBOARD = {
+    "inline_keyboard": [
+        [
+            {"text": "✅ View in CMS", "url": f"{FRONTEND_URL}/admin/returns"}
+        ]
+    ]
+}
+RETURN_REASON_LABELS = {
+    "defective": "🔴 Product Defective/Damaged",
+    "wrong_item": "🟠 Wrong Item Received",
+    "not_as_expected": "🟡 Product Not As Expected",
+    "size_issue": "🔵 Size/Fit Issue",
+    "quality": "🟣 Quality Not Satisfactory",
+    "changed_mind": "⚪ Customer Changed Mind",
+    "other": "⚫ Other Reason"
+}
+# Pooled connection to api.telegram.org so each alert skips the TCP/TLS handshake
+_telegram_session = requests.Session()
+_telegram_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+RETURN_TELEGRAM_TEMPLATE = (
+    "🔄 <b>RETURN REQUEST RECEIVED</b>\n"
+    "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    "📦 <b>Order ID:</b> <code>{order_id}</code>\n"
+    "👤 <b>Customer:</b> {customer_name}\n"
+    "📍 <b>Address:</b> {address}, {city} - {pincode}\n\n"
+    "🏷️ <b>Product(s):</b> {product_names}\n"
+    "💰 <b>Order Value:</b> ₹{total_amount}\n\n"
+    "📋 <b>Reason:</b> {reason_text}\n"
+    "{details_text}"
+    "{images_text}"
+    "\n━━━━━━━━━━━━━━━━━━━━━━\n"
+    "💵 <b>Refund Amount:</b> ₹{refund_amount}\n\n"
+)
+
 @router.post("/api/customer/returns")
 def create_return_request(
     return_data: ReturnRequest,
+    background_tasks: BackgroundTasks,
     current_user: Customer = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -394,13 +465,16 @@ def create_return_request(
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find the order
-    order = session.exec(
-        select(Order).where(Order.order_id == return_data.order_id)
+    # Find the order together with any existing return for it (one round-trip)
+    row = session.exec(
+        select(Order, OrderReturn.status)
+        .outerjoin(OrderReturn, OrderReturn.order_id == Order.order_id)
+        .where(Order.order_id == return_data.order_id)
     ).first()
     
-    if not order:
+    if not row:
         raise HTTPException(status_code=404, detail="Order not found")
+    order, existing_return_status = row
     
     # Verify order belongs to this customer (by email or user_id)
     if order.user_id:
@@ -424,12 +498,14 @@ def create_return_request(
             raise HTTPException(status_code=400, detail="Return window has expired (7 days from delivery)")
     
     # Check if return already exists for this order
-    existing_return = session.exec(
-        select(OrderReturn).where(OrderReturn.order_id == return_data.order_id)
-    ).first()
+    if existing_return_status is not None:
+        raise HTTPException(status_code=400, detail=f"Return request already exists. Status: {existing_return_status}")
     
-    if existing_return:
-        raise HTTPException(status_code=400, detail=f"Return request already exists. Status: {existing_return.status}")
+    # Parse the order's items once: used for the partial refund and the alert
+    try:
+        order_items = json.loads(order.items_json) if order.items_json else []
+    except (json.JSONDecodeError, TypeError):
+        order_items = []
     
     # Calculate refund amount (full amount for now, or partial if items specified)
     refund_amount = order.total_amount
@@ -438,7 +514,6 @@ def create_return_request(
     # If specific items are specified, calculate partial refund
     if return_items:
         try:
-            order_items = json.loads(order.items_json) if order.items_json else []
             partial_total = 0
             selected_items = []
             for idx in return_items:
@@ -448,7 +523,8 @@ def create_return_request(
                     selected_items.append(item)
             refund_amount = partial_total
             return_items = selected_items
-        except:
+        except (TypeError, AttributeError):
+            # Malformed item indices/entries: fall back to a full refund
             pass
     
     # Create return request
@@ -465,85 +541,9 @@ def create_return_request(
     
     session.add(new_return)
     session.commit()
-    session.refresh(new_return)
     
-    # --- Send Telegram Notification ---
-    try:
-        bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        frontend_url = os.getenv("FRONTEND_URL", "https://varahajewels.in")
-        
-        if bot_token and chat_id:
-            # Parse order items for product details
-            order_items = []
-            try:
-                order_items = json.loads(order.items_json) if order.items_json else []
-            except:
-                pass
-            
-            product_names = ", ".join([item.get('name', 'Product') for item in order_items]) or "N/A"
-            
-            # Image links
-            image_links = ""
-            if return_data.images:
-                for i, img in enumerate(return_data.images[:5]):  # Max 5 images
-                    image_links += f"\n📷 [Image {i+1}]({img})"
-            
-            # Reason labels
-            reason_labels = {
-                "defective": "🔴 Product Defective/Damaged",
-                "wrong_item": "🟠 Wrong Item Received",
-                "not_as_expected": "🟡 Product Not As Expected",
-                "size_issue": "🔵 Size/Fit Issue",
-                "quality": "🟣 Quality Not Satisfactory",
-                "changed_mind": "⚪ Customer Changed Mind",
-                "other": "⚫ Other Reason"
-            }
-            
-            reason_text = reason_labels.get(return_data.reason, return_data.reason)
-            
-            message = (
-                f"🔄 <b>RETURN REQUEST RECEIVED</b>\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"📦 <b>Order ID:</b> <code>{order.order_id}</code>\n"
-                f"👤 <b>Customer:</b> {order.customer_name}\n"
-                f"📍 <b>Address:</b> {order.address}, {order.city} - {order.pincode}\n\n"
-                f"🏷️ <b>Product(s):</b> {product_names}\n"
-                f"💰 <b>Order Value:</b> ₹{order.total_amount}\n\n"
-                f"📋 <b>Reason:</b> {reason_text}\n"
-            )
-            
-            if return_data.description:
-                message += f"📝 <b>Details:</b> {return_data.description}\n"
-            
-            if image_links:
-                message += f"\n<b>Product Images:</b>{image_links}\n"
-            
-            message += f"\n━━━━━━━━━━━━━━━━━━━━━━\n"
-            message += f"💵 <b>Refund Amount:</b> ₹{refund_amount}\n\n"
-            
-            # Inline keyboard for approve/reject
-            keyboard = {
-                "inline_keyboard": [
-                    [
-                        {"text": "✅ View in CMS", "url": f"{frontend_url}/admin/returns"}
-                    ]
-                ]
-            }
-            
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "HTML",
-                "reply_markup": keyboard,
-                "disable_web_page_preview": False
-            }
-            
-            requests.post(url, json=payload, timeout=10)
-            print(f"Telegram notification sent for return request {new_return.id}")
-    except Exception as e:
-        print(f"Failed to send Telegram notification: {str(e)}")
+    # Telegram alert is queued after the response and sent in a batch
+    background_tasks.add_task(_queue_return_alert, order, order_items, return_data, refund_amount, new_return.id)
     
     return {
         "message": "Return request submitted successfully",
@@ -552,3 +552,118 @@ def create_return_request(
         "refund_amount": new_return.refund_amount
     }
 
+
+def _format_return_alert(order: Order, order_items: list, return_data: ReturnRequest, refund_amount: float) -> str:
+    """Build the new-return alert text for the admin Telegram chat."""
+    product_names = ", ".join([item.get('name', 'Product') for item in order_items]) or "N/A"
+    
+    # Image links (max 5)
+    image_links = "".join(
+        f"\n📷 [Image {i+1}]({img})" for i, img in enumerate((return_data.images or [])[:5])
+    )
+    
+    return RETURN_TELEGRAM_TEMPLATE.format(
+        order_id=order.order_id,
+        customer_name=order.customer_name,
+        address=order.address,
+        city=order.city,
+        pincode=order.pincode,
+        product_names=product_names,
+        total_amount=order.total_amount,
+        reason_text=RETURN_REASON_LABELS.get(return_data.reason, return_data.reason),
+        details_text=f"📝 <b>Details:</b> {return_data.description}\n" if return_data.description else "",
+        images_text=f"\n<b>Product Images:</b>{image_links}\n" if image_links else "",
+        refund_amount=refund_amount
+    )
+
+# --- Batched return alerts ---
+# Return requests only enqueue their alert; a single background task drains the
+# queue and sends whatever arrived within RETURN_ALERT_INTERVAL seconds (up to
+# RETURN_ALERT_BATCH_SIZE alerts) as one Telegram message.
+RETURN_ALERT_QUEUE_MAX = 1000
+RETURN_ALERT_BATCH_SIZE = 10
+RETURN_ALERT_INTERVAL = 1.0
+TELEGRAM_MAX_MESSAGE = 4096
+
+_return_alert_queue: asyncio.Queue = asyncio.Queue(maxsize=RETURN_ALERT_QUEUE_MAX)
+_return_alert_sender: asyncio.Task = None
+
+async def _queue_return_alert(order: Order, order_items: list, return_data: ReturnRequest, refund_amount: float, return_id: int):
+    if not (TELEGRAM_SEND_URL and TELEGRAM_CHAT_ID):
+        return
+    try:
+        _return_alert_queue.put_nowait((return_id, _format_return_alert(order, order_items, return_data, refund_amount)))
+    except asyncio.QueueFull:
+        print(f"Return alert queue full, dropping alert for return request {return_id}")
+
+def _send_return_alerts(batch: list):
+    """Send queued alerts, packing as many as fit into each Telegram message (runs in a worker thread)."""
+    messages, current = [], ""
+    for _, text in batch:
+        if current and len(current) + len(text) > TELEGRAM_MAX_MESSAGE:
+            messages.append(current)
+            current = ""
+        current += text
+    messages.append(current)
+
+    return_ids = ", ".join(str(return_id) for return_id, _ in batch)
+    try:
+        for text in messages:
+            _telegram_session.post(TELEGRAM_SEND_URL, json={
+                "chat_id": TELEGRAM_CHAT_ID,
+                "text": text,
+                "parse_mode": "HTML",
+                "reply_markup": RETURN_TELEGRAM_KEYBOARD,
+                "disable_web_page_preview": False
+            }, timeout=10)
+        print(f"Telegram notification sent for return request(s) {return_ids}")
+    except (requests.RequestException, ValueError) as e:
+        print(f"Failed to send Telegram notification: {str(e)}")
+
+async def _drain_return_alerts():
+    loop = asyncio.get_running_loop()
+    batch = []
+    try:
+        while True:
+            batch = [await _return_alert_queue.get()]
+            deadline = loop.time() + RETURN_ALERT_INTERVAL
+            while len(batch) < RETURN_ALERT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_return_alert_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Shielded so a shutdown cancel waits for the in-flight send
+            send, batch = asyncio.ensure_future(asyncio.to_thread(_send_return_alerts, batch)), []
+            try:
+                await asyncio.shield(send)
+            except asyncio.CancelledError:
+                await send
+                raise
+    except asyncio.CancelledError:
+        # Cancelled while collecting: send the alerts already taken off the queue
+        if batch:
+            await asyncio.to_thread(_send_return_alerts, batch)
+        raise
+
+def start_return_alert_sender():
+    global _return_alert_sender
+    if _return_alert_sender is None or _return_alert_sender.done():
+        _return_alert_sender = asyncio.create_task(_drain_return_alerts())
+
+async def stop_return_alert_sender():
+    """Stop the sender (letting it send its current batch), then flush whatever is still queued."""
+    global _return_alert_sender
+    if _return_alert_sender is not None:
+        _return_alert_sender.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _return_alert_sender
+        _return_alert_sender = None
+    batch = []
+    while not _return_alert_queue.empty():
+        batch.append(_return_alert_queue.get_nowait())
+    if batch:
+        await asyncio.to_thread(_send_return_alerts, batch)
+
@@ -1,290 +1,100 @@
-from fastapi import APIRouter, Depends, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlmodel import Session
+from fastapi import APIRouter, Request, Response, status
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlalchemy import text
-from database import get_session
+from database import engine
+from cache_utils import TTLCache
 from monitoring import monitor
 from routes.web import check_admin_cookie
-import time
-import html
+from pathlib import Path
+import asyncio
+import orjson
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 router = APIRouter()
 
+# The page skeleton is a template compiled once at import and rendered on load;
+# the constant CSS is served separately so the browser caches it.
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+_JINJA_ENV = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html"])
+)
+_MONITOR_TMPL = _JINJA_ENV.get_template("dashboard/monitor.html")
+_MONITOR_CSS = (TEMPLATES_DIR / "dashboard" / "monitor.css").read_bytes()
+
+LOG_LEVEL_COLORS = {"ERROR": "#e74c3c", "WARN": "#f1c40f"}  # anything else: green (info)
+
+# Live values are pushed to open dashboards over SSE every STREAM_INTERVAL seconds.
+STREAM_INTERVAL = 3
+status_cache = TTLCache(ttl=STREAM_INTERVAL, maxsize=1)
+
+@router.get("/dashboard/monitor.css")
+def dashboard_css():
+    return Response(
+        content=_MONITOR_CSS,
+        media_type="text/css",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+def _collect_status() -> dict:
+    """Gather the live dashboard values (one DB ping), shared by the page and the stream."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        db_status, db_color = "CONNECTED", "#2ecc71"  # Green
+        code_health, health_color = "HEALTHY", "#2ecc71"
+    except Exception:
+        db_status, db_color = "DISCONNECTED", "#e74c3c"  # Red
+        code_health, health_color = "CRITICAL", "#e74c3c"
+
+    return {
+        "ram_usage": monitor.get_ram_usage(),
+        "uptime": monitor.get_uptime(),
+        "db_status": db_status,
+        "db_color": db_color,
+        "code_health": code_health,
+        "health_color": health_color,
+        "total_requests": monitor.total_requests,
+        "errors_500": monitor.status_codes['500'],
+        "logs": list(monitor.logs),
+        "crashes": list(monitor.recent_crashes),
+        "slow_routes": list(monitor.slow_routes),
+    }
+
+def _current_status() -> dict:
+    # Computed at most once per interval however many dashboards are open
+    return status_cache.get_or_load("status", _collect_status)
+
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_ui(request: Request, session: Session = Depends(get_session)):
+async def dashboard_ui(request: Request):
     # 1. Security Check
     if not check_admin_cookie(request):
         return RedirectResponse(url="/login?next=/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
-    # 2. Gather Stats
-    ram_usage = monitor.get_ram_usage()
-    uptime = monitor.get_uptime()
-    
-    # 3. Check DB Status
-    try:
-        session.exec(text("SELECT 1"))
-        db_status = "CONNECTED"
-        db_color = "#2ecc71" # Green
-        code_health = "HEALTHY"
-        health_color = "#2ecc71"
-    except Exception:
-        db_status = "DISCONNECTED"
-        db_color = "#e74c3c" # Red
-        code_health = "CRITICAL"
-        health_color = "#e74c3c"
-
-    # 4. Render HTML (Server Side Rendering)
-    # 5. Render Console Logs
-    console_logs_html = ""
-    for log in monitor.logs:
-        color = "#2ecc71" # Green (Info)
-        if log['level'] == 'ERROR': color = "#e74c3c" # Red
-        elif log['level'] == 'WARN': color = "#f1c40f" # Yellow
-        
-        source_color = "#3498db" if log['source'] == 'FRONTEND' else "#9b59b6"
-
-        console_logs_html += f"""
-            <div style="font-family: 'Courier New', monospace; font-size: 13px; margin-bottom: 4px; border-bottom: 1px solid #333; padding-bottom: 2px;">
-                <span style="color: #666;">[{log['timestamp']}]</span>
-                <span style="color: {source_color}; font-weight: bold;">[{log['source']}]</span>
-                <span style="color: {color};">{html.escape(str(log['message']))}</span>
-            </div>
-        """
-
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Varaha Server Monitor 🛡️</title>
-        <meta http-equiv="refresh" content="3"> 
-        <link href="https://fonts.googleapis.com/css2?family=Cormorant+Garamond:wght@600;700&family=Inter:wght@400;500&display=swap" rel="stylesheet">
-        <style>
-            :root {{
-                --bg-color: #1a1a2d;
-                --card-bg: #252540;
-                --text-color: #F4E6D8; /* Warm Sand */
-                --accent-copper: #A3562A;
-                --heritage-brown: #7A3B23;
-            }}
-            body {{ 
-                font-family: 'Inter', sans-serif; 
-                background-color: var(--bg-color); 
-                color: var(--text-color); 
-                padding: 20px; 
-                margin: 0;
-            }}
-            .container {{ max-width: 1200px; margin: 0 auto; }}
-            
-            header {{
-                text-align: center;
-                border-bottom: 2px solid var(--accent-copper);
-                padding-bottom: 20px;
-                margin-bottom: 30px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            
-            h1 {{ 
-                font-family: 'Cormorant Garamond', serif; 
-                color: var(--text-color);
-                margin: 0;
-            }}
-            
-            .badge {{
-                background: var(--heritage-brown);
-                padding: 5px 15px;
-                border-radius: 20px;
-                font-size: 0.9rem;
-                display: flex;
-                align-items: center;
-                gap: 8px;
-            }}
-            
-            /* Grid Layout */
-            .stats-grid {{ 
-                display: grid; 
-                grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); 
-                gap: 20px; 
-                margin-bottom: 40px; 
-            }}
-            
-            .card {{ 
-                background: var(--card-bg); 
-                padding: 25px; 
-                border-radius: 12px; 
-                border: 1px solid rgba(163, 86, 42, 0.2); 
-                text-align: center; 
-                transition: transform 0.2s;
-            }}
-            
-            .card:hover {{ transform: translateY(-3px); border-color: var(--accent-copper); }}
-            
-            .card h3 {{ 
-                margin: 0; 
-                font-size: 14px; 
-                color: #a0a0c0; 
-                text-transform: uppercase; 
-                letter-spacing: 1px;
-            }}
-            
-            .card .value {{ font-size: 32px; font-weight: bold; margin: 15px 0; font-family: 'Cormorant Garamond', serif; }}
-            
-            .status-ok {{ color: #2ecc71; }} 
-            .status-bad {{ color: #e74c3c; }} 
-            .status-warn {{ color: #f1c40f; }} 
+    # 2. Gather Stats (DB ping runs off the event loop)
+    current = await asyncio.to_thread(_current_status)
 
-            .section-title {{
-                font-family: 'Cormorant Garamond', serif;
-                font-size: 1.5rem;
-                margin-bottom: 15px;
-                color: var(--accent-copper);
-                border-left: 4px solid var(--accent-copper);
-                padding-left: 10px;
-            }}
+    # 3. Render HTML (Server Side Rendering; autoescape covers log messages/paths).
+    # After this the page updates itself from /dashboard/stream.
+    return _MONITOR_TMPL.render(level_colors=LOG_LEVEL_COLORS, **current)
 
-            .logs-section {{ 
-                background: var(--card-bg); 
-                padding: 20px; 
-                border-radius: 12px; 
-                margin-bottom: 30px;
-                border: 1px solid rgba(163, 86, 42, 0.1);
-            }}
-            
-            table {{ width: 100%; border-collapse: collapse; }}
-            th, td {{ 
-                text-align: left; 
-                padding: 12px; 
-                border-bottom: 1px solid rgba(255,255,255,0.05); 
-                font-size: 0.95rem;
-            }}
-            th {{ color: #a0a0c0; font-weight: 500; }}
-            tr:last-child td {{ border-bottom: none; }}
-            
-            .method-tag {{
-                padding: 3px 8px;
-                border-radius: 4px;
-                font-size: 11px;
-                font-weight: bold;
-                background: #444;
-            }}
-
-            .console-box {{
-                background: #000;
-                border: 1px solid #333;
-                border-radius: 8px;
-                padding: 15px;
-                height: 300px;
-                overflow-y: auto;
-                font-family: 'Courier New', monospace;
-                box-shadow: inset 0 0 20px rgba(0,0,0,0.5);
-            }}
-            
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <header>
-                <div style="display:flex; align-items:center; gap:15px;">
-                     <img src="https://newvaraha-nwbd.vercel.app/varaha-assets/logo.png" height="40" style="filter: brightness(2);">
-                     <h1>System Dashboard</h1>
-                </div>
-                <div class="badge">
-                    <span style="width:10px; height:10px; border-radius:50%; background-color:{health_color}; box-shadow: 0 0 10px {health_color};"></span>
-                    System: {code_health}
-                </div>
-            </header>
-            
-            <div class="stats-grid">
-                <div class="card">
-                    <h3>RAM Usage</h3>
-                    <div class="value" style="color: #3498db;">{ram_usage} MB</div>
-                </div>
-
-                <div class="card">
-                    <h3>Database</h3>
-                    <div class="value" style="color: {db_color};">{db_status}</div>
-                </div>
-
-                <div class="card">
-                    <h3>Uptime</h3>
-                    <div class="value" style="color: var(--text-color);">{uptime}</div>
-                </div>
-
-                <div class="card">
-                    <h3>Total Requests</h3>
-                    <div class="value">{monitor.total_requests}</div>
-                </div>
-                
-                 <div class="card">
-                    <h3>Errors (500)</h3>
-                    <div class="value { 'status-bad' if monitor.status_codes['500'] > 0 else 'status-ok' }">{monitor.status_codes['500']}</div>
-                </div>
-            </div>
-            
-            <h2 class="section-title">🖥️ Live Console Logs</h2>
-            <div class="logs-section" style="padding:0; background:transparent; border:none;">
-                <div class="console-box">
-                    {console_logs_html if console_logs_html else '<div style="color:#666; text-align:center; padding-top:100px;">Waiting for logs...</div>'}
-                </div>
-            </div>
-
-            <h2 class="section-title">⚠️ Recent Crashes</h2>
-            <div class="logs-section">
-                <table>
-                    <thead>
-                        <tr>
-                            <th width="15%">Time</th>
-                            <th width="10%">Method</th>
-                            <th width="35%">Path</th>
-                            <th>Error</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {"".join([f'''
-                            <tr>
-                                <td>{log['timestamp']}</td>
-                                <td><span class="method-tag" style="color:#ffcccc;">{log['method']}</span></td>
-                                <td style="font-family:monospace;">{html.escape(str(log['path']))}</td>
-                                <td style="color:#e74c3c;">{html.escape(str(log['error_type']))}</td>
-                            </tr>
-                        ''' for log in monitor.recent_crashes])}
-                        
-                        {'<tr><td colspan="4" style="text-align:center; color:#2ecc71; padding: 20px;">All Systems Operational. No recent crashes.</td></tr>' if not monitor.recent_crashes else ''}
-                    </tbody>
-                </table>
-            </div>
-            
-            <h2 class="section-title">🐢 Slow Routes (>500ms)</h2>
-            <div class="logs-section">
-                <table>
-                    <thead>
-                        <tr>
-                            <th width="20%">Time</th>
-                            <th width="60%">Path</th>
-                            <th>Duration</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                         {"".join([f'''
-                            <tr>
-                                <td>{log['timestamp']}</td>
-                                <td style="font-family:monospace;">{html.escape(str(log['path']))}</td>
-                                <td style="color:#f1c40f;">{log['time_taken']}</td>
-                            </tr>
-                        ''' for log in monitor.slow_routes])}
-                        
-                        {'<tr><td colspan="3" style="text-align:center; color:#2ecc71; padding: 20px;">Performance Optimal. No slow routes detected.</td></tr>' if not monitor.slow_routes else ''}
-                    </tbody>
-                </table>
-            </div>
-
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html_content
+@router.get("/dashboard/stream")
+async def dashboard_stream(request: Request):
+    """Server-Sent Events feed of the dashboard values, one frame per interval."""
+    if not check_admin_cookie(request):
+        return Response(status_code=status.HTTP_401_UNAUTHORIZED)
+
+    async def frames():
+        while not await request.is_disconnected():
+            current = await asyncio.to_thread(_current_status)
+            yield b"data: " + orjson.dumps(current) + b"\n\n"
+            await asyncio.sleep(STREAM_INTERVAL)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 from pydantic import BaseModel
 
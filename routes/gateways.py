@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from typing import List, Dict, Any
-import json
+import orjson
 from pydantic import BaseModel
 
 # Internal Imports
@@ -37,7 +37,7 @@ def create_gateway(gateway_in: GatewayCreate, token: str = Depends(oauth2_scheme
         name=gateway_in.name,
         provider=gateway_in.provider,
         is_active=gateway_in.is_active,
-        credentials_json=json.dumps(gateway_in.credentials)
+        credentials_json=orjson.dumps(gateway_in.credentials).decode()
     )
     
     session.add(gateway)
@@ -52,12 +52,12 @@ def read_gateways(token: str = Depends(oauth2_scheme), session: Session = Depend
     for g in gateways:
         g_dict = g.model_dump()
         try:
-            creds = json.loads(g.credentials_json)
+            creds = orjson.loads(g.credentials_json)
             # Mask sensitive fields
             if 'key_secret' in creds:
                 creds['key_secret'] = '********'
-            g_dict['credentials_json'] = json.dumps(creds)
-        except:
+            g_dict['credentials_json'] = orjson.dumps(creds).decode()
+        except (orjson.JSONDecodeError, TypeError):
             pass
         results.append(g_dict)
     return results
@@ -80,7 +80,7 @@ def update_gateway(gateway_id: int, gateway_in: GatewayUpdate, token: str = Depe
     # Only update credentials if they don't contain masked values
     # This prevents credential corruption when just toggling active status
     incoming_creds = gateway_in.credentials
-    existing_creds = json.loads(gateway.credentials_json) if gateway.credentials_json else {}
+    existing_creds = orjson.loads(gateway.credentials_json) if gateway.credentials_json else {}
     
     has_masked_values = any(
         isinstance(v, str) and '********' in v 
@@ -89,7 +89,7 @@ def update_gateway(gateway_id: int, gateway_in: GatewayUpdate, token: str = Depe
     
     if not has_masked_values:
         # All credentials are real, update them
-        gateway.credentials_json = json.dumps(incoming_creds)
+        gateway.credentials_json = orjson.dumps(incoming_creds).decode()
     else:
         # Some credentials are masked - merge: keep existing for masked, update non-masked
         merged_creds = existing_creds.copy()
@@ -100,7 +100,7 @@ def update_gateway(gateway_id: int, gateway_in: GatewayUpdate, token: str = Depe
             else:
                 # Update with new value
                 merged_creds[key] = value
-        gateway.credentials_json = json.dumps(merged_creds)
+        gateway.credentials_json = orjson.dumps(merged_creds).decode()
     
     session.add(gateway)
     session.commit()
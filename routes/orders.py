@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 from database import get_session
 from models import Order, Customer, AdminUser, SystemSetting, PaymentGateway, StoreSettings
 from dependencies import get_current_user, oauth2_scheme, get_current_admin
-from notifications import send_order_notifications, send_shipping_notifications
+from notifications import send_order_notifications_async, send_shipping_notifications
 from rapidshyp_utils import rapidshyp_client
 import razorpay
 import traceback
@@ -633,7 +633,7 @@ def create_cod_order(order_data: OrderCreate, background_tasks: BackgroundTasks,
             print(f"⚠️ Address auto-save failed (non-blocking): {e}")
 
     # Notify
-    background_tasks.add_task(send_order_notifications, new_order.dict())
+    background_tasks.add_task(send_order_notifications_async, new_order.dict())
     
     return {"ok": True, "orderId": new_order.order_id}
 
@@ -1200,7 +1200,7 @@ def confirm_phonepe_order(payload: Dict[str, Any], background_tasks: BackgroundT
         deduct_stock_for_items(items, session)
         
         # Send notifications
-        background_tasks.add_task(send_order_notifications, new_order.dict())
+        background_tasks.add_task(send_order_notifications_async, new_order.dict())
         
         print(f"DEBUG PhonePe: Order {new_order.order_id} created successfully")
         
@@ -1405,7 +1405,7 @@ def update_order_status_callback(payload: Dict[str, Any], background_tasks: Back
         # 🔒 Deduct stock for Razorpay orders (was missing before!)
         deduct_stock_for_items(items, session)
         
-        background_tasks.add_task(send_order_notifications, new_order.dict())
+        background_tasks.add_task(send_order_notifications_async, new_order.dict())
         
         return {"ok": True, "orderId": new_order.order_id}
 
@@ -1422,7 +1422,7 @@ def create_order(order: Order, background_tasks: BackgroundTasks, current_user:
         session.refresh(order)
         
         # Send notifications in background
-        background_tasks.add_task(send_order_notifications, order.dict())
+        background_tasks.add_task(send_order_notifications_async, order.dict())
         
         return order
     except Exception as e:
@@ -6,12 +6,19 @@ from pydantic import BaseModel
 from database import get_session
 from models import Promotion, Coupon, AdminUser
 from dependencies import get_current_admin
+from .coupons import coupon_cache, coupon_list_cache
 
 router = APIRouter()
 
 
+def _clear_coupon_caches():
+    """Drop cached coupon lookups/lists; call after the commit that changed a synced coupon."""
+    coupon_cache.clear()
+    coupon_list_cache.clear()
+
+
 def _sync_coupon_to_db(session: Session, coupon_code: str, discount_type: str, discount_value: float, min_cart_value: float = None, max_discount: float = None, is_active: bool = True, payment_method_restriction: str = "none"):
-    """Auto-create or update a Coupon row when an offer has a coupon_code."""
+    """Auto-create or update a Coupon row when an offer has a coupon_code. Returns the row."""
     if not coupon_code:
         return
     code = coupon_code.strip().upper()
@@ -28,6 +35,7 @@ def _sync_coupon_to_db(session: Session, coupon_code: str, discount_type: str, d
         existing.max_discount = max_discount
         existing.payment_method_restriction = payment_method_restriction or "none"
         session.add(existing)
+        return existing
     else:
         from datetime import datetime
         new_coupon = Coupon(
@@ -41,6 +49,7 @@ def _sync_coupon_to_db(session: Session, coupon_code: str, discount_type: str, d
             created_at=datetime.utcnow(),
         )
         session.add(new_coupon)
+        return new_coupon
 
 
 def _delete_synced_coupon(session: Session, coupon_code: str):
@@ -231,6 +240,7 @@ async def create_promotion(
             )
 
         session.commit()
+        _clear_coupon_caches()
         session.refresh(promo)
         return promo
 
@@ -306,6 +316,7 @@ async def update_promotion(
             )
 
         session.commit()
+        _clear_coupon_caches()
         session.refresh(promo)
         return promo
 
@@ -329,6 +340,7 @@ def delete_promotion(
     _delete_synced_coupon(session, promo.coupon_code)
     session.delete(promo)
     session.commit()
+    _clear_coupon_caches()
     return {"ok": True, "message": "Promotion deleted"}
 
 
@@ -354,5 +366,6 @@ def toggle_promotion(
             payment_method_restriction=getattr(promo, 'payment_method_restriction', 'none'),
         )
     session.commit()
+    _clear_coupon_caches()
     session.refresh(promo)
     return promo
@@ -9,7 +9,9 @@ from pydantic import BaseModel
 from datetime import datetime
 import json
 import hashlib
+import hmac
 import os
+from functools import lru_cache
 
 from database import get_session
 from models import Order
@@ -25,15 +27,16 @@ class TrackLookupRequest(BaseModel):
     email: Optional[str] = None
     phone: Optional[str] = None
 
+@lru_cache(maxsize=4096)
 def generate_tracking_token(order_id: str) -> str:
-    """Generate a secure token for public tracking URL."""
+    """Generate a secure token for public tracking URL (cached per order)."""
     data = f"{order_id}_{TRACKING_SECRET}"
     return hashlib.sha256(data.encode()).hexdigest()[:16]
 
 def verify_tracking_token(order_id: str, token: str) -> bool:
     """Verify the tracking token."""
     expected = generate_tracking_token(order_id)
-    return token == expected
+    return hmac.compare_digest((token or "").encode(), expected.encode())
 
 # Status mapping: RapidShyp status -> Varaha step
 RAPIDSHYP_STATUS_MAP = {
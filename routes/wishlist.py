@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlmodel import Session, select
+from sqlalchemy import exists
 from typing import List, Optional
 from pydantic import BaseModel
 import uuid
@@ -44,13 +45,12 @@ async def add_to_wishlist(
 ):
     try:
         # Check if already exists
-        statement = select(Wishlist).where(
+        statement = select(exists().where(
             Wishlist.customer_id == current_user.id, 
             Wishlist.product_id == item.product_id
-        )
-        existing = session.exec(statement).first()
+        ))
         
-        if existing:
+        if session.scalar(statement):
             return {"message": "Already in wishlist"}
             
         # Add new item
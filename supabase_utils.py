@@ -20,18 +20,26 @@ def init_supabase() -> Client:
         return None
     return create_client(url, key)
 
-def compress_image_to_webp(file_content: bytes, content_type: str, max_size: int = 1920, quality: int = 85) -> tuple:
+def _read_all(file_content) -> bytes:
+    """Return raw bytes for either bytes or a file-like object (rewound first)."""
+    if hasattr(file_content, "read"):
+        file_content.seek(0)
+        return file_content.read()
+    return file_content
+
+def compress_image_to_webp(file_content, content_type: str, max_size: int = 1920, quality: int = 85) -> tuple:
     """
     Compresses an image and converts it to WebP format.
+    file_content may be bytes or a file-like object; PIL decodes straight from it.
     Returns (compressed_content, new_filename_extension, new_content_type)
     """
     try:
         # Check if it's an image
         if not content_type or "image" not in content_type:
-            return file_content, None, content_type
+            return _read_all(file_content), None, content_type
         
         # Skip if already WebP (but still compress)
-        img = Image.open(BytesIO(file_content))
+        img = Image.open(file_content if hasattr(file_content, "read") else BytesIO(file_content))
         
         # Convert to RGB if necessary (for PNG with transparency, convert to RGBA first)
         if img.mode in ('RGBA', 'LA', 'P'):
@@ -57,13 +65,13 @@ def compress_image_to_webp(file_content: bytes, content_type: str, max_size: int
         
         compressed_content = output.getvalue()
         
-        print(f"Image compressed: {len(file_content)} bytes -> {len(compressed_content)} bytes (WebP)")
+        print(f"Image compressed: {len(compressed_content)} bytes (WebP)")
         
         return compressed_content, '.webp', 'image/webp'
     except Exception as e:
         print(f"Image compression error: {e}")
         # Return original if compression fails
-        return file_content, None, content_type
+        return _read_all(file_content), None, content_type
 
 # Video compression removed
 
@@ -80,17 +88,6 @@ def upload_file_to_supabase(file: UploadFile, bucket: str = None):
             print("Supabase client initialization failed")
             return None
 
-        # Read file content
-        file_content = file.file.read()
-        file.file.seek(0)
-        
-        if not file_content:
-            print("File content is empty")
-            return None
-            
-        file_size_mb = len(file_content) / (1024 * 1024)
-        print(f"File read success: {file_size_mb:.2f} MB")
-        
         content_type = file.content_type
         original_filename = file.filename.replace(" ", "_").replace("(", "").replace(")", "")
         
@@ -102,11 +99,20 @@ def upload_file_to_supabase(file: UploadFile, bucket: str = None):
                 bucket = "IMAGE"
 
         # Compress Image (Video compression removed as per user request)
+        # Images are decoded straight from the spooled upload, so only the
+        # compressed WebP is held in memory; other files are read as-is.
         if bucket == "IMAGE" and content_type and "image" in content_type:
-            file_content, new_ext, content_type = compress_image_to_webp(file_content, content_type)
+            file_content, new_ext, content_type = compress_image_to_webp(file.file, content_type)
             if new_ext:
                 base_name = os.path.splitext(original_filename)[0]
                 original_filename = base_name + new_ext
+        else:
+            file_content = file.file.read()
+        file.file.seek(0)
+
+        if not file_content:
+            print("File content is empty")
+            return None
                 
         # Generate unique path
         timestamp = int(time.time())